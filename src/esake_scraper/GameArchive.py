@@ -0,0 +1,158 @@
+"""This script archives the raw text of every scraped game and reprocesses the archive
+   through PlayersData, so that parser fixes don't require crawling the website again"""
+import json
+import pathlib
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pandas as pd
+from esake_scraper import db
+from esake_scraper.PlayersData import PlayersData
+from esake_scraper.shared.common_paths import DATA_DIR
+from esake_scraper.shared.logging import logging
+import esake_scraper.utils as utils
+
+
+logger = logging.getLogger("ESAKE game archive logger")
+
+ARCHIVE_DIR = DATA_DIR / "game_archive"
+
+
+class GameArchive:
+    """
+    An append-only archive of the text nodes of game pages, i.e. what SoupParser.get_soup
+    returns for games. Each game is stored as a zlib-compressed json list in a single data
+    file and an index file holds the offset and length of every game for random access.
+    Archiving the same game again appends a new version, which supersedes the previous one.
+    Appends happen under a file lock, so any number of processes can write to the archive.
+    """
+
+    def __init__(self, archive_dir: pathlib.Path = ARCHIVE_DIR):
+        """
+        Arguments:
+            archive_dir: The directory of the archive. It is created if it doesn't exist
+        """
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = archive_dir / "games.dat"
+        self.index_path = archive_dir / "games_index.csv"
+        self.lock_path = archive_dir / "games.lock"
+        self.index_ = {}
+        self.read_index()
+
+    def read_index(self):
+        """
+        Read the index file into a dict mapping each game id to the offset and length of
+        its latest version in the data file
+        """
+        self.index_ = {}
+        if not self.index_path.exists():
+            return
+        with open(self.index_path) as f:
+            for line in f:
+                # Skip a last line that another process is still writing
+                if not line.endswith("\n"):
+                    break
+                game_id, offset, length = line.strip().split(",")
+                self.index_[game_id] = (int(offset), int(length))
+
+    def append(self, game_id: str, text_nodes: list):
+        """
+        Append the text nodes of a game to the archive
+
+        Arguments:
+            game_id:    The game id
+            text_nodes: The text nodes of the game page, as returned by SoupParser.get_soup
+        """
+        data = zlib.compress(json.dumps([str(node) for node in text_nodes]).encode("utf-8"), 9)
+        with utils.file_lock(self.lock_path):
+            with open(self.data_path, "ab") as f:
+                offset = f.seek(0, 2)
+                f.write(data)
+            # The index entry is written only once the data are complete
+            with open(self.index_path, "a") as f:
+                f.write(f"{game_id},{offset},{len(data)}\n")
+        self.index_[game_id] = (offset, len(data))
+
+    def get(self, game_id: str) -> list:
+        """
+        Read the text nodes of a game from the archive
+
+        Arguments:
+            game_id: The game id
+
+        Returns:
+            list
+        """
+        if game_id not in self.index_:
+            # The game may have been archived by another process since the index was read
+            self.read_index()
+        offset, length = self.index_[game_id]
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def game_ids(self) -> list:
+        """
+        Get the ids of all archived games, in the order they were first archived
+        """
+        return list(self.index_)
+
+
+# The archive opened by each reprocessing worker process
+_worker_archive = None
+
+
+def _init_worker(archive_dir: pathlib.Path):
+    global _worker_archive
+    _worker_archive = GameArchive(archive_dir)
+
+
+def _reprocess_game(game_id: str, use_cache: bool) -> pd.DataFrame:
+    """
+    Run PlayersData over an archived game. Games that can't be parsed are logged and skipped,
+    so that a single bad game doesn't stop the reprocessing of the whole archive.
+    """
+    try:
+        pld = PlayersData(game_id, _worker_archive.get(game_id), False, use_cache)
+    except Exception as e:
+        logger.warning(f"Could not parse game {game_id}: {e!r}")
+        return pd.DataFrame()
+    return pld.players_data_df_
+
+
+def reprocess(archive_dir: pathlib.Path = ARCHIVE_DIR, to_csv: bool = True,
+              use_cache: bool = False, n_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Stream every archived game through PlayersData in parallel worker processes. The workers
+    only parse, whereas the parsed games are ingested by the calling process.
+
+    Arguments:
+        archive_dir: The directory of the archive
+        to_csv:      Whether to save (ingest) each parsed game
+        use_cache:   Whether PlayersData should use its parse cache
+        n_workers:   The number of worker processes. Defaults to the number of CPUs
+
+    Returns:
+        pd.DataFrame with the players' data of all the games that could be parsed
+    """
+    game_ids = GameArchive(archive_dir).game_ids()
+    logger.info(f"Reprocessing {len(game_ids)} archived games")
+    if not game_ids:
+        return pd.DataFrame()
+    with ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker, initargs=(archive_dir,)
+    ) as executor:
+        players_data_list = list(
+            executor.map(_reprocess_game, game_ids, [use_cache] * len(game_ids), chunksize=16)
+        )
+    if to_csv:
+        for game_id, players_data_df in zip(game_ids, players_data_list):
+            if not players_data_df.empty:
+                db.ingest_game(players_data_df, game_id)
+    return pd.concat(players_data_list, ignore_index=True)
+
+
+if __name__ == "__main__":
+    reprocess()
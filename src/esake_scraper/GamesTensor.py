@@ -0,0 +1,195 @@
+"""This script exports the games table to a memory-mapped player x game x stat tensor,
+   so that many processes can share and slice it without reading the csv files"""
+import json
+import pathlib
+import uuid
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from esake_scraper import db
+from esake_scraper.shared.common_paths import DATA_DIR
+import esake_scraper.utils as utils
+
+
+TENSOR_DIR = DATA_DIR / "games_tensor"
+TENSOR_DTYPE = "float32"
+
+
+def _get_generation_paths(tensor_dir: pathlib.Path, generation: str) -> dict:
+    """
+    Get the paths of the tensor and sidecar tables of a generation
+    """
+    return {
+        "tensor": tensor_dir / f"tensor.{generation}.dat",
+        "players_table": tensor_dir / f"players_table.{generation}.csv",
+        "games_table": tensor_dir / f"games_table.{generation}.csv",
+        "stats_table": tensor_dir / f"stats_table.{generation}.csv",
+    }
+
+
+def _read_meta(tensor_dir: pathlib.Path) -> dict:
+    """
+    Read the meta of the current tensor, or an empty dict if no tensor has been written
+    """
+    if not (tensor_dir / "tensor_meta.json").exists():
+        return {}
+    with open(tensor_dir / "tensor_meta.json") as f:
+        return json.load(f)
+
+
+def write_games_tensor(games_table: pd.DataFrame, tensor_dir: pathlib.Path = TENSOR_DIR):
+    """
+    Read a dataframe with data from many games and write a dense numpy.memmap tensor indexed
+    by player, game and stat, along with the sidecar tables mapping players, games and stats
+    to their position along each axis. Players that didn't play in a game have NaN stats for it.
+
+    Every write creates a new generation of files, which tensor_meta.json is then atomically
+    switched to, so that readers never see a tensor whose shape or sidecar tables don't match
+    its data. The files of the previous generation are kept, for readers that still use them,
+    and older generations are removed.
+
+    Arguments:
+        games_table: A dataframe with data from many games, as returned by db.get_games_table
+        tensor_dir:  The directory to write the tensor and its sidecar tables to
+    """
+    # A player has a single cell per game, so duplicate rows would silently overwrite each other
+    duplicates = games_table.loc[
+        games_table.duplicated(["player_name", "game_id"]), ["player_name", "game_id"]
+    ].drop_duplicates()
+    if not duplicates.empty:
+        raise ValueError(
+            f"Duplicate rows for player_name and game_id:\n{duplicates.to_string(index=False)}"
+        )
+
+    tensor_dir.mkdir(parents=True, exist_ok=True)
+    # The ids of the players table have gaps where names were filtered out, so the tensor
+    # is indexed by a separate, contiguous position
+    players_table = db.get_players_table(games_table)
+    players_table["position"] = np.arange(len(players_table))
+    games_ids_table = (
+        games_table[["game_id", "game_date"]]
+        .drop_duplicates("game_id")
+        .sort_values(["game_date", "game_id"], ignore_index=True)
+    )
+    games_ids_table["position"] = np.arange(len(games_ids_table))
+    stats_table = pd.DataFrame({"stat": db.FORM_STATS, "position": np.arange(len(db.FORM_STATS))})
+
+    previous_generation = _read_meta(tensor_dir).get("generation")
+    generation = uuid.uuid4().hex
+    paths = _get_generation_paths(tensor_dir, generation)
+    shape = (len(players_table), len(games_ids_table), len(stats_table))
+    tensor = np.memmap(paths["tensor"], dtype=TENSOR_DTYPE, mode="w+", shape=shape)
+    tensor[:] = np.nan
+
+    # Player names that were left out of the players table (e.g. because they include
+    # digits) have no position and are skipped
+    player_idx = games_table["player_name"].map(
+        pd.Series(players_table["position"].values, index=players_table["player_name"])
+    )
+    game_idx = games_table["game_id"].map(
+        pd.Series(games_ids_table["position"].values, index=games_ids_table["game_id"])
+    )
+    valid_mask = player_idx.notna().to_numpy()
+    tensor[
+        player_idx[valid_mask].astype(int).to_numpy(), game_idx[valid_mask].astype(int).to_numpy()
+    ] = games_table.loc[valid_mask, db.FORM_STATS].to_numpy(dtype=TENSOR_DTYPE)
+    tensor.flush()
+    del tensor
+
+    players_table.to_csv(paths["players_table"])
+    games_ids_table.to_csv(paths["games_table"])
+    stats_table.to_csv(paths["stats_table"])
+    # The meta is replaced last, as it's what points readers to the new generation
+    utils.atomic_write_bytes(
+        tensor_dir / "tensor_meta.json",
+        json.dumps({"shape": shape, "dtype": TENSOR_DTYPE, "generation": generation}).encode(
+            "utf-8"
+        ),
+    )
+
+    kept_paths = set(paths.values())
+    if previous_generation is not None:
+        kept_paths |= set(_get_generation_paths(tensor_dir, previous_generation).values())
+    for path in tensor_dir.iterdir():
+        if path.suffix in [".dat", ".csv"] and path not in kept_paths:
+            path.unlink()
+
+
+class GamesTensor:
+    """
+    Open the current tensor written by write_games_tensor read-only and slice it by player
+    names, game ids and stats. The data are memory-mapped, so they are shared between processes
+    and only the pages that are sliced are read from disk. An opened tensor keeps its data
+    while write_games_tensor writes newer generations.
+    """
+
+    def __init__(self, tensor_dir: pathlib.Path = TENSOR_DIR):
+        """
+        Arguments:
+            tensor_dir: The directory the tensor was written to
+        """
+        meta = _read_meta(tensor_dir)
+        paths = _get_generation_paths(tensor_dir, meta["generation"])
+        self.players_table_ = pd.read_csv(paths["players_table"], index_col=0)
+        self.games_table_ = pd.read_csv(paths["games_table"], index_col=0, dtype={"game_id": str})
+        self.stats_table_ = pd.read_csv(paths["stats_table"], index_col=0)
+        self.tensor_ = np.memmap(
+            paths["tensor"], dtype=meta["dtype"], mode="r", shape=tuple(meta["shape"])
+        )
+
+    @staticmethod
+    def _get_positions(sidecar_table: pd.DataFrame, column: str,
+                       values: Optional[list]) -> np.ndarray:
+        """
+        Map a list of values of a sidecar table column to their positions in the tensor.
+        None selects all positions.
+        """
+        if values is None:
+            return sidecar_table["position"].to_numpy()
+        positions = pd.Series(
+            sidecar_table["position"].values, index=sidecar_table[column]
+        ).reindex(values)
+        if positions.isna().any():
+            raise KeyError(f"Unknown {column}: {list(positions[positions.isna()].index)}")
+        return positions.astype(int).to_numpy()
+
+    def get(self, player_names: Optional[list] = None, game_ids: Optional[list] = None,
+            stats: Optional[list] = None) -> np.ndarray:
+        """
+        Get the sub-tensor for the given players, games and stats, in the given order.
+        Leaving any of them to None selects all of them.
+
+        Arguments:
+            player_names: A list of player names
+            game_ids:     A list of game ids
+            stats:        A list of stats, e.g. ["points", "assists"]
+
+        Returns:
+            np.ndarray of shape (players, games, stats)
+        """
+        player_positions = self._get_positions(self.players_table_, "player_name", player_names)
+        game_positions = self._get_positions(self.games_table_, "game_id", game_ids)
+        stat_positions = self._get_positions(self.stats_table_, "stat", stats)
+        return self.tensor_[np.ix_(player_positions, game_positions, stat_positions)]
+
+    def get_stat_table(self, stat: str) -> pd.DataFrame:
+        """
+        Get a single stat for all players and games as a dataframe with player names as
+        index and game ids as columns
+
+        Arguments:
+            stat: The stat, e.g. "points"
+
+        Returns:
+            pd.DataFrame
+        """
+        return pd.DataFrame(
+            self.get(stats=[stat])[:, :, 0],
+            index=self.players_table_["player_name"],
+            columns=self.games_table_["game_id"],
+        )
+
+
+if __name__ == "__main__":
+    write_games_tensor(db.get_games_table())
@@ -1,14 +1,17 @@
 """This script includes all functionality to read and parse players' data on
    a per game basis"""
+import hashlib
+import pickle
 import re
+import shutil
 
 from bs4 import BeautifulSoup
 
 import numpy as np
 import pandas as pd
+from esake_scraper import db
 from esake_scraper.shared.common_paths import DATA_DIR
 from esake_scraper.shared.logging import logging
-from esake_scraper.SoupParser import SoupParser
 import esake_scraper.utils as utils
 
 
@@ -20,9 +23,27 @@ HEADERS = {
 
 logger = logging.getLogger("ESAKE players logger")
 
+# Bump this whenever a change in the parsing affects the parsed players' data, so that
+# the parse results cached by earlier versions are no longer used
+PARSER_VERSION = 1
+
+PARSE_CACHE_DIR = DATA_DIR / "parse_cache"
+
+
+def prune_parse_cache():
+    """
+    Remove the parse results cached by parser versions other than the current one
+    """
+    if not PARSE_CACHE_DIR.exists():
+        return
+    for version_dir in PARSE_CACHE_DIR.iterdir():
+        if version_dir.name != f"v{PARSER_VERSION}":
+            shutil.rmtree(version_dir)
+
 
 class PlayersData:
-    def __init__(self, game_id: str, game_id_soup: BeautifulSoup, to_csv: bool):
+    def __init__(self, game_id: str, game_id_soup: BeautifulSoup, to_csv: bool,
+                 use_cache: bool = False):
         self.game_id = game_id
         self.game_id_soup = game_id_soup
         self.game_id_list_ = []
@@ -32,13 +53,18 @@ class PlayersData:
         self.players_data_ = [[], []]
         self.players_data_df_ = pd.DataFrame()
         self.to_csv = to_csv
+        self.use_cache = use_cache
         self.get_game_view()
-        self.get_teams()
+        if not (use_cache and self._load_from_cache()):
+            self.get_teams()
+            if self.teams_list_:
+                self.get_players()
+                self.get_data_per_player()
+                self._get_game_date()
+                self.get_players_data_df()
+                if use_cache:
+                    self._save_to_cache()
         if self.teams_list_:
-            self.get_players()
-            self.get_data_per_player()
-            self._get_game_date()
-            self.get_players_data_df()
             if to_csv:
                 logger.info("Saving to csv")
                 self.save_to_csv()
@@ -63,6 +89,51 @@ class PlayersData:
         game_view_list = [game_view for game_view in game_view_list if game_view]
         self.game_view_text_ = " ".join(list(game_view_list))
 
+    def _get_cache_path(self):
+        """
+        Get the path of the cached parse result, keyed by the parser version and a hash
+        of the game view text
+        """
+        text_hash = hashlib.sha256(self.game_view_text_.encode("utf-8")).hexdigest()
+        return PARSE_CACHE_DIR / f"v{PARSER_VERSION}" / f"{text_hash}.pickle"
+
+    def _load_from_cache(self) -> bool:
+        """
+        Load the players' data of a game whose text has already been parsed by the current
+        parser version. Only players_data_df_ and the attributes derived from it are restored.
+        An entry that can't be read, e.g. because it was left truncated, counts as a miss.
+
+        Returns:
+            True if the game was found in the cache, False otherwise
+        """
+        cache_path = self._get_cache_path()
+        if not cache_path.exists():
+            return False
+        try:
+            with open(cache_path, "rb") as f:
+                self.players_data_df_ = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read the cached parse result {cache_path.name}: {e!r}")
+            self.players_data_df_ = pd.DataFrame()
+            return False
+        self.players_data_df_["game_id"] = self.game_id
+        self.teams_list_ = list(self.players_data_df_["team"].unique())
+        self.players_list_ = [
+            list(self.players_data_df_.loc[self.players_data_df_["team"] == team, "player_name"])
+            for team in self.teams_list_
+        ]
+        self.game_date_ = self.players_data_df_["game_date"].iloc[0]
+        return True
+
+    def _save_to_cache(self):
+        """
+        Save the players' data to the parse cache. The entry is replaced atomically, so that
+        concurrent readers never see a partially written one
+        """
+        cache_path = self._get_cache_path()
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        utils.atomic_write_bytes(cache_path, pickle.dumps(self.players_data_df_))
+
     def _get_game_date(self):
         """
         Get the date of the game. It makes sense to capture the date of the game instead of the series, as games can
@@ -359,23 +430,16 @@ class PlayersData:
         return all_shots
 
     def save_to_csv(self):
-        self.players_data_df_.to_csv(DATA_DIR / f"{self.teams_list_[0]}_{self.teams_list_[1]}.csv")
+        """
+        Save the players' data to raw_games_data, keyed by game_id, so that rematches don't
+        overwrite each other and unchanged re-scrapes are skipped
+        """
+        db.ingest_game(self.players_data_df_, self.game_id)
 
 
 if __name__ == "__main__":
-    for series in range(1, 27):
-        print(series)
-        # series = 8
-        SERIES = series
-        SEASON = "regular"
-        series_sp = SoupParser(SEASON, SERIES, False)
-        series_soup = series_sp.soup_
-        game_id_list = utils.get_game_id_list(series_soup)
-        for game_id in game_id_list:
-            print(game_id)
-            # There were too many errors for this game_id and it was decided
-            # to skip it
-            if game_id != "0010811B":
-                game_sp = SoupParser(SEASON, SERIES, True, game_id)
-                game_soup = game_sp.soup_
-                pld = PlayersData(game_id, game_soup, True)
+    # Imported here, as crawl itself imports PlayersData
+    from esake_scraper.crawl import crawl_season
+    from esake_scraper.GameArchive import GameArchive
+
+    crawl_season("regular", range(1, 27), GameArchive())
@@ -1,3 +1,4 @@
+import collections
 import time
 from typing import Optional
 
@@ -19,6 +20,26 @@ HEADERS = {
 
 SEASON_MAP = {"regular": 1, "play_offs": 2}
 
+# The box score markers PlayersData relies on. If a plain http fetch of a game page
+# doesn't include them, the page has to be rendered by a (headless) browser
+BOX_SCORE_MARKERS = ("SHOTS", "ΣΥΝΟΛΟ")
+
+# Per run counts of how game pages were fetched, i.e. "plain" or "headless"
+FETCH_STATS = collections.Counter()
+
+
+def log_fetch_stats():
+    """
+    Log how many game pages were fetched with a plain http request and how many
+    needed the headless browser fallback
+    """
+    total = sum(FETCH_STATS.values())
+    if total:
+        logger.info(
+            f"Fetched {total} game pages, {FETCH_STATS['headless']} "
+            f"({FETCH_STATS['headless'] / total:.0%}) needed the headless browser"
+        )
+
 
 class SoupParser:
     """
@@ -58,19 +79,50 @@ class SoupParser:
         else:
             self.url_ = f"http://www.esake.gr/el/action/EsakeResults?idchampionship=0000000D&idteam=&idseason=0000000{self.season}&series={self.series}"
 
+    def _get_game_soup_plain(self) -> bool:
+        """
+        Try to get the text of a game page with a plain http request, which is much cheaper
+        than rendering it in a browser.
+
+        Returns:
+            True if the page included the box score, False otherwise
+        """
+        try:
+            request = requests.get(self.url_, headers=HEADERS, verify=False, timeout=30)
+            request.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Plain fetch of game {self.game_id} failed: {e}")
+            return False
+        self.soup_ = BeautifulSoup(request.content, "html.parser")
+        self.soup_ = self.soup_.findAll(text=True)
+        game_view_text = " ".join(self.soup_)
+        return all(marker in game_view_text for marker in BOX_SCORE_MARKERS)
+
+    def _get_game_soup_headless(self):
+        """
+        Get the text of a game page by rendering it in a headless browser
+        """
+        options = webdriver.ChromeOptions()
+        options.add_argument("headless")
+        driver = webdriver.Chrome(SRC_DIR / "chromedriver", options=options)
+        driver.get(self.url_)
+        time.sleep(5)
+        html = driver.page_source
+        self.soup_ = BeautifulSoup(html, "html.parser")
+        self.soup_ = self.soup_.findAll(text=True)
+
     def get_soup(self):
         """
-        Parse the html data from a url into a BeautifulSoup object.
+        Parse the html data from a url into a BeautifulSoup object. For games, a plain http
+        fetch is tried first and the headless browser is only used if the box score is missing.
         """
         if self.is_game_id:
-            options = webdriver.ChromeOptions()
-            options.add_argument("headless")
-            driver = webdriver.Chrome(SRC_DIR / "chromedriver", options=options)
-            driver.get(self.url_)
-            time.sleep(5)
-            html = driver.page_source
-            self.soup_ = BeautifulSoup(html, "html.parser")
-            self.soup_ = self.soup_.findAll(text=True)
+            if self._get_game_soup_plain():
+                FETCH_STATS["plain"] += 1
+            else:
+                logger.info(f"Falling back to the headless browser for game {self.game_id}")
+                self._get_game_soup_headless()
+                FETCH_STATS["headless"] += 1
         else:
             request = requests.get(self.url_, headers=HEADERS, verify=False)
             html = request.content
@@ -0,0 +1,264 @@
+"""This script implements a work queue of series and game scraping tasks backed by SQLite,
+   so that a crawl can be split among any number of worker processes"""
+import contextlib
+import os
+import pathlib
+import socket
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from esake_scraper.crawl import crawl_game, get_series_game_ids
+from esake_scraper.GameArchive import GameArchive
+from esake_scraper.shared.common_paths import DATA_DIR
+from esake_scraper.shared.logging import logging
+from esake_scraper.SoupParser import log_fetch_stats
+
+
+logger = logging.getLogger("ESAKE work queue logger")
+
+WORK_QUEUE_PATH = DATA_DIR / "work_queue.sqlite"
+
+CREATE_TASKS_TABLE = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    season TEXT NOT NULL,
+    series INTEGER NOT NULL,
+    game_id TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    UNIQUE (kind, season, series, game_id)
+)
+"""
+
+
+class WorkQueue:
+    """
+    A queue of "series" and "game" tasks in a SQLite file. A worker claims the pending task
+    with the highest priority and holds a lease on it, which it extends with heartbeats while
+    working. Tasks whose lease expired, e.g. because their worker died, can be claimed again,
+    until they have been attempted max_attempts times, after which they are marked as failed.
+
+    Every operation opens its own connection and claims happen in an immediate transaction,
+    so any number of processes can share the file. Over NFS this relies on the NFS server
+    supporting file locks, which is why the rollback journal is used instead of WAL.
+    """
+
+    def __init__(self, db_path: pathlib.Path = WORK_QUEUE_PATH, lease_seconds: float = 300,
+                 max_attempts: int = 3):
+        """
+        Arguments:
+            db_path:       The path of the SQLite file. It is created if it doesn't exist
+            lease_seconds: How long a claim or heartbeat keeps a task leased
+            max_attempts:  How many times a task is attempted before it is marked as failed
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.execute(CREATE_TASKS_TABLE)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Open a connection in autocommit mode, so that transactions are explicit
+        """
+        connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def add_task(self, kind: str, season: str, series: int, game_id: str = "",
+                 priority: int = 0):
+        """
+        Add a task to the queue, unless the same task has already been added
+
+        Arguments:
+            kind:     Either "series" or "game"
+            season:   Either "regular" or "play_offs"
+            series:   The series number
+            game_id:  The game id for "game" tasks
+            priority: Tasks with higher priority are claimed first
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO tasks (kind, season, series, game_id, priority) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, season, series, game_id, priority),
+            )
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """
+        Lease the pending (or expired) task with the highest priority to a worker
+
+        Arguments:
+            worker_id: A unique id of the worker
+
+        Returns:
+            The task as a dict, or None if there is no task left to claim
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', lease_owner = NULL "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            task = connection.execute(
+                "SELECT * FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if task is not None:
+                connection.execute(
+                    "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, task["id"]),
+                )
+                task = connection.execute(
+                    "SELECT * FROM tasks WHERE id = ?", (task["id"],)
+                ).fetchone()
+            connection.execute("COMMIT")
+        return dict(task) if task is not None else None
+
+    def heartbeat(self, task_id: int, worker_id: str) -> bool:
+        """
+        Extend the lease of a task
+
+        Returns:
+            False if the worker no longer holds the lease, e.g. because it expired and
+            the task was claimed by another worker
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, task_id, worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker_id: str):
+        """
+        Mark a task leased by the worker as done
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND lease_owner = ?",
+                (task_id, worker_id),
+            )
+
+    def fail(self, task_id: int, worker_id: str, error: str):
+        """
+        Release a task leased by the worker after an error, so that it is retried, or mark
+        it as failed if it has been attempted max_attempts times
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE tasks "
+                "SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (self.max_attempts, error, task_id, worker_id),
+            )
+
+    def get_status_counts(self) -> dict:
+        """
+        Get the number of tasks per status
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+
+def add_series_tasks(work_queue: WorkQueue, season: str, series_list: list):
+    """
+    Add a "series" task for each of the series of a season. Earlier series get higher
+    priority, so that the crawl roughly follows the order of the season.
+    """
+    for series in series_list:
+        work_queue.add_task("series", season, series, priority=-series * 100)
+
+
+def _run_task(work_queue: WorkQueue, task: dict, game_archive: GameArchive):
+    """
+    Run a task. A "series" task adds a "game" task for each game of the series, whereas
+    a "game" task crawls the game, i.e. archives it and saves its players' data.
+    """
+    if task["kind"] == "series":
+        for game_id in get_series_game_ids(task["season"], task["series"]):
+            # Games get priority over the series following their own
+            work_queue.add_task(
+                "game", task["season"], task["series"], game_id, priority=task["priority"] + 1
+            )
+    else:
+        crawl_game(task["season"], task["series"], task["game_id"], game_archive)
+
+
+def run_worker(work_queue: WorkQueue, game_archive: GameArchive,
+               worker_id: Optional[str] = None, heartbeat_seconds: float = 60):
+    """
+    Claim and run tasks until there are none left. While a task runs, a background thread
+    sends heartbeats to keep its lease.
+
+    Arguments:
+        work_queue:        The work queue
+        game_archive:      The archive to append the raw text of the games to
+        worker_id:         A unique id of the worker. Defaults to <hostname>-<pid>
+        heartbeat_seconds: The interval between heartbeats. It should be well below
+                           the lease duration of the queue
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    while True:
+        task = work_queue.claim(worker_id)
+        if task is None:
+            logger.info(f"No tasks left for worker {worker_id}: {work_queue.get_status_counts()}")
+            log_fetch_stats()
+            return
+
+        stop_heartbeat = threading.Event()
+
+        def send_heartbeats(task_id=task["id"]):
+            while not stop_heartbeat.wait(heartbeat_seconds):
+                try:
+                    has_lease = work_queue.heartbeat(task_id, worker_id)
+                except sqlite3.OperationalError as e:
+                    # E.g. "database is locked", which happens over NFS. The lease is still
+                    # held, so the heartbeat is retried on the next interval
+                    logger.warning(f"Heartbeat of task {task_id} failed, retrying: {e!r}")
+                    continue
+                if not has_lease:
+                    logger.warning(f"Worker {worker_id} lost the lease of task {task_id}")
+                    return
+
+        heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeat_thread.start()
+        try:
+            _run_task(work_queue, task, game_archive)
+        except Exception as e:
+            logger.warning(f"Task {task['id']} failed: {e!r}")
+            work_queue.fail(task["id"], worker_id, repr(e))
+        else:
+            work_queue.complete(task["id"], worker_id)
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+
+if __name__ == "__main__":
+    WORK_QUEUE = WorkQueue()
+    add_series_tasks(WORK_QUEUE, "regular", range(1, 27))
+    run_worker(WORK_QUEUE, GameArchive())
@@ -0,0 +1,143 @@
+"""Contains all functions that build the static json bundle the front end loads its data from"""
+import gzip
+import hashlib
+import json
+import pathlib
+
+import pandas as pd
+from esake_scraper import db
+from esake_scraper.shared.common_paths import FRONT_END_DIR
+import esake_scraper.utils as utils
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+BUNDLE_DIR = FRONT_END_DIR / "data"
+
+
+def _to_records(table: pd.DataFrame) -> list:
+    """
+    Convert a dataframe to a list of json-serializable dicts, with NaN values as None
+    """
+    return json.loads(table.to_json(orient="records", force_ascii=False))
+
+
+def _get_shards(games_table: pd.DataFrame, grouping_column: str) -> dict:
+    """
+    Read a dataframe with data from many games and get the data of each player or team
+    that the front end shows, i.e. their stats, derived metrics and matchups.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        grouping_column:  Either "player_name" or "team"
+
+    Returns:
+        A dict mapping each player or team name to the contents of its shard
+    """
+    stats_table = db.get_stats_table(games_table, grouping_column).set_index(grouping_column)
+    metrics_table = db.get_derived_metrics_table(games_table, grouping_column).set_index(
+        grouping_column
+    )
+    matchups_table = db.get_matchups_table(games_table, grouping_column).reset_index()
+
+    shards = {}
+    for name in stats_table.index:
+        shards[name] = {
+            grouping_column: name,
+            "stats": _to_records(stats_table.loc[[name]])[0],
+            "metrics": _to_records(metrics_table.loc[[name]])[0],
+            "matchups": _to_records(
+                matchups_table[matchups_table[grouping_column] == name].drop(
+                    grouping_column, axis=1
+                )
+            ),
+        }
+    return shards
+
+
+def _write_compressed(path: pathlib.Path, data: bytes):
+    """
+    Atomically write data along with its gzip (and, if brotli is installed, brotli)
+    compressed versions
+    """
+    # mtime=0 keeps the gzip output identical for identical data
+    utils.atomic_write_bytes(
+        pathlib.Path(f"{path}.gz"), gzip.compress(data, compresslevel=9, mtime=0)
+    )
+    if brotli is not None:
+        utils.atomic_write_bytes(pathlib.Path(f"{path}.br"), brotli.compress(data))
+    # The uncompressed file is written last, as its existence marks the shard as complete
+    utils.atomic_write_bytes(path, data)
+
+
+def _write_shard(shard: dict, shards_dir: pathlib.Path) -> str:
+    """
+    Write a shard under a name derived from the hash of its contents, so that it can be cached
+    indefinitely. A shard whose contents haven't changed already exists and isn't rewritten.
+
+    Returns:
+        The file name of the shard
+    """
+    data = json.dumps(shard, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode(
+        "utf-8"
+    )
+    filename = f"{hashlib.sha256(data).hexdigest()[:16]}.json"
+    if not (shards_dir / filename).exists():
+        _write_compressed(shards_dir / filename, data)
+    return filename
+
+
+def build_bundle(games_table: pd.DataFrame, bundle_dir: pathlib.Path = BUNDLE_DIR) -> dict:
+    """
+    Read a dataframe with data from many games and write a json shard per player and team,
+    along with a manifest.json mapping player and team names to their shards. The new shards
+    are written first and the manifest is then replaced atomically. Shards referenced by
+    neither the new nor the previous manifest are removed last, so that clients still
+    holding the previous manifest can fetch its shards.
+
+    Arguments:
+        games_table: A dataframe with data from many games, as returned by db.get_games_table
+        bundle_dir:  The directory to write the bundle to
+
+    Returns:
+        The manifest, i.e. {"players": {name: shard}, "teams": {name: shard}}
+    """
+    shards_dir = bundle_dir / "shards"
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    previous_manifest = {}
+    if (bundle_dir / "manifest.json").exists():
+        with open(bundle_dir / "manifest.json", encoding="utf-8") as f:
+            previous_manifest = json.load(f)
+    manifest = {
+        manifest_key: {
+            name: f"shards/{_write_shard(shard, shards_dir)}"
+            for name, shard in _get_shards(games_table, grouping_column).items()
+        }
+        for manifest_key, grouping_column in [("players", "player_name"), ("teams", "team")]
+    }
+
+    # The manifest keeps its name, as it's the entry point the front end looks up
+    _write_compressed(
+        bundle_dir / "manifest.json",
+        json.dumps(manifest, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode(
+            "utf-8"
+        ),
+    )
+
+    referenced_shards = {
+        pathlib.Path(shard).name
+        for shards_manifest in [manifest, previous_manifest]
+        for shards in shards_manifest.values()
+        for shard in shards.values()
+    }
+    for path in shards_dir.iterdir():
+        if path.name.split(".json")[0] + ".json" not in referenced_shards:
+            path.unlink()
+    return manifest
+
+
+if __name__ == "__main__":
+    build_bundle(db.get_games_table())
@@ -0,0 +1,74 @@
+"""This script crawls the series and games of a season, archiving the raw text of every game
+   and saving its players' data. Both the sequential crawl and the WorkQueue workers use it"""
+from typing import Optional
+
+from esake_scraper.GameArchive import GameArchive
+from esake_scraper.PlayersData import PlayersData
+from esake_scraper.shared.logging import logging
+from esake_scraper.SoupParser import SoupParser, log_fetch_stats
+import esake_scraper.utils as utils
+
+
+logger = logging.getLogger("ESAKE crawl logger")
+
+# There were too many errors for these game ids and it was decided to skip them
+SKIPPED_GAME_IDS = {"0010811B"}
+
+
+def get_series_game_ids(season: str, series: int) -> list:
+    """
+    Get the ids of the games of a series
+
+    Arguments:
+        season: Either "regular" or "play_offs"
+        series: The series number
+
+    Returns:
+        list
+    """
+    series_soup = SoupParser(season, series, False).soup_
+    return utils.get_game_id_list(series_soup)
+
+
+def crawl_game(season: str, series: int, game_id: str,
+               game_archive: GameArchive) -> Optional[PlayersData]:
+    """
+    Fetch a game, append its raw text to the archive and parse and save its players' data,
+    using the parse cache. Games in SKIPPED_GAME_IDS are skipped.
+
+    Arguments:
+        season:       Either "regular" or "play_offs"
+        series:       The series number
+        game_id:      The game id
+        game_archive: The archive to append the raw text of the game to
+
+    Returns:
+        The parsed PlayersData, or None if the game was skipped
+    """
+    if game_id in SKIPPED_GAME_IDS:
+        logger.info(f"Skipping game {game_id}")
+        return None
+    game_soup = SoupParser(season, series, True, game_id).soup_
+    game_archive.append(game_id, game_soup)
+    return PlayersData(game_id, game_soup, True, use_cache=True)
+
+
+def crawl_season(season: str, series_list: list, game_archive: GameArchive):
+    """
+    Crawl the games of the given series of a season one by one
+
+    Arguments:
+        season:       Either "regular" or "play_offs"
+        series_list:  The series numbers to crawl
+        game_archive: The archive to append the raw text of the games to
+    """
+    for series in series_list:
+        logger.info(f"Crawling series {series}")
+        for game_id in get_series_game_ids(season, series):
+            logger.info(f"Crawling game {game_id}")
+            crawl_game(season, series, game_id, game_archive)
+    log_fetch_stats()
+
+
+if __name__ == "__main__":
+    crawl_season("regular", range(1, 27), GameArchive())
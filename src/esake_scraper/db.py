@@ -1,22 +1,165 @@
 """Contains all functions that prepare the data tables"""
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from esake_scraper.shared.common_paths import DATA_DIR
+from esake_scraper.shared.logging import logging
+import esake_scraper.utils as utils
+
+logger = logging.getLogger("ESAKE db logger")
+
+GAMES_MANIFEST_PATH = DATA_DIR / "games_manifest.csv"
+GAMES_MANIFEST_LOCK_PATH = DATA_DIR / "games_manifest.lock"
+DATA_TABLES_DIR = DATA_DIR / "data_tables"
 
 
 # TODO: Rename "player_name" column to "player"
 
+# The per game counting stats used for the rolling and cumulative (form) tables
+FORM_STATS = [
+    "points",
+    "two_point_achieved",
+    "two_point_attempted",
+    "three_point_achieved",
+    "three_point_attempted",
+    "free_throws_achieved",
+    "free_throws_attempted",
+    "turnovers",
+    "steals",
+    "fouls_committed",
+    "fouls_received",
+    "blocks",
+    "assists",
+    "offensive_rebounds",
+    "defensive_rebounds",
+    "duration",
+]
+
+# The rolling window of the form tables in data_tables
+FORM_WINDOW = 5
+
+# The columns of the files in raw_games_data, as written by PlayersData, and their types.
+# They are applied while parsing, so that e.g. all-digit game ids keep their leading zeros
+GAMES_TABLE_SCHEMA = {
+    "team": pa.string(),
+    "player_name": pa.string(),
+    **{stat: pa.float64() for stat in FORM_STATS},
+    "game_id": pa.string(),
+    "game_date": pa.string(),
+}
+
+# The number of files read concurrently by get_games_table
+N_READ_WORKERS = 8
+
+# The minimum volumes below which derived metrics and percentile ranks are left to NaN
+MIN_GAMES = 5
+MIN_MINUTES = 60
+MIN_SHOT_ATTEMPTS = 20
+
+# The derived metrics for which lower values are better, so that they're ranked descending
+LOWER_IS_BETTER_METRICS = ["avg_turnovers"]
+
+
+def get_games_manifest() -> pd.DataFrame:
+    """
+    Read the manifest with the fingerprint of every ingested game, indexed by game_id
+    """
+    if not GAMES_MANIFEST_PATH.exists():
+        return pd.DataFrame(columns=["fingerprint"], index=pd.Index([], name="game_id"))
+    # The index is set after reading, as dtype isn't applied to index_col and numeric
+    # looking game ids would otherwise be parsed as integers
+    return pd.read_csv(GAMES_MANIFEST_PATH, dtype=str).set_index("game_id")
+
+
+def ingest_game(players_data_df: pd.DataFrame, game_id: str) -> bool:
+    """
+    Save the players' data of a game to raw_games_data, keyed by its game_id, and update the
+    tables in data_tables with it. If a game with the same fingerprint has already been
+    ingested, nothing is written, whereas a game whose data have changed replaces the previous
+    version. The manifest is read and updated under a file lock and all files are replaced
+    atomically, so that any number of processes can ingest games at the same time.
+
+    Arguments:
+        players_data_df: A dataframe with the players' data of a single game
+        game_id:         The game id
+
+    Returns:
+        True if the game was written, False if it was skipped as a duplicate
+    """
+    fingerprint = utils.get_fingerprint(players_data_df)
+    with utils.file_lock(GAMES_MANIFEST_LOCK_PATH):
+        games_manifest = get_games_manifest()
+        if games_manifest["fingerprint"].get(game_id) == fingerprint:
+            logger.info(f"Game {game_id} has already been ingested, skipping")
+            return False
+
+        (DATA_DIR / "raw_games_data").mkdir(parents=True, exist_ok=True)
+        utils.atomic_write_bytes(
+            DATA_DIR / "raw_games_data" / f"{game_id}.csv",
+            players_data_df.to_csv().encode("utf-8"),
+        )
+        update_data_tables(players_data_df.assign(game_id=game_id))
+        # The manifest is written last, so that a game whose ingest failed is ingested again
+        games_manifest.loc[game_id, "fingerprint"] = fingerprint
+        utils.atomic_write_bytes(GAMES_MANIFEST_PATH, games_manifest.to_csv().encode("utf-8"))
+    return True
+
+
+def _read_game_file(filename: str) -> pd.DataFrame:
+    """
+    Read a single file of raw_games_data with the pyarrow csv reader and the declared types
+    """
+    games_table = pa_csv.read_csv(
+        DATA_DIR / "raw_games_data" / filename,
+        convert_options=pa_csv.ConvertOptions(column_types=GAMES_TABLE_SCHEMA),
+    ).to_pandas()
+    # The first, unnamed column is the index the files were written with
+    games_table = games_table.set_index(games_table.columns[0])
+    games_table.index.name = None
+    return games_table
+
+
+def _is_keyed_by_game_id(filename: str, games_table: pd.DataFrame) -> bool:
+    """
+    Check whether a file of raw_games_data is named after the game_id of its rows, i.e. was
+    written by ingest_game, as opposed to a legacy {team1}_{team2}.csv file
+    """
+    return not games_table.empty and filename == f"{games_table['game_id'].iloc[0]}.csv"
+
 
 def get_games_table() -> pd.DataFrame:
     """
-    Read the files from many games and concatenate them to a single dataframe
+    Read the files from many games concurrently and concatenate them to a single dataframe
     """
-    games_list = []
-    for filename in os.listdir(DATA_DIR / "raw_games_data"):
-        games_table = pd.read_csv(DATA_DIR / "raw_games_data" / filename, index_col=0)
-        games_list.append(games_table)
-    games_table = pd.concat(games_list)
+    # Skip the temporary files of writes that are in progress
+    filenames = sorted(
+        filename
+        for filename in os.listdir(DATA_DIR / "raw_games_data")
+        if filename.endswith(".csv")
+    )
+    # Reading is mostly I/O and pyarrow releases the GIL while parsing, so threads suffice
+    with ThreadPoolExecutor(max_workers=N_READ_WORKERS) as executor:
+        games_list = list(executor.map(_read_game_file, filenames))
+
+    # Files from before the ingest was keyed by game_id ({team1}_{team2}.csv) can hold
+    # a game that has since been ingested again. For every game, only the rows of a single
+    # file are kept: a file named after the game_id takes precedence over legacy files,
+    # and among legacy files the last one does
+    file_ranks = np.array(
+        [
+            idx + len(filenames) * _is_keyed_by_game_id(filename, table)
+            for idx, (filename, table) in enumerate(zip(filenames, games_list))
+        ]
+    )
+    games_table = pd.concat(games_list, keys=range(len(games_list)), copy=False)
+    row_ranks = pd.Series(file_ranks[games_table.index.get_level_values(0)])
+    best_row_ranks = row_ranks.groupby(games_table["game_id"].to_numpy()).transform("max")
+    games_table = games_table[(row_ranks == best_row_ranks).to_numpy()].droplevel(0)
     games_table["player_name"] = games_table["player_name"].apply(lambda x: _capitalize_name(x))
     return games_table
 
@@ -242,14 +385,503 @@ def get_stats_table(games_table: pd.DataFrame, grouping_column: str) -> pd.DataF
     return stats_table
 
 
+def _get_per_game_table(games_table: pd.DataFrame, grouping_column: str) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and get one row per grouping_column value
+    and game, sorted by date. For players this is a row per player and game, whereas for
+    teams the stats of all the team's players in a game are summed up.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        grouping_column:  Either "player_name" or "team"
+
+    Returns:
+        pd.DataFrame
+    """
+    per_game_table = (
+        games_table[[grouping_column, "game_id", "game_date"] + FORM_STATS]
+        .groupby([grouping_column, "game_id", "game_date"])
+        .sum()
+        .reset_index()
+    )
+    per_game_table["game_date"] = pd.to_datetime(per_game_table["game_date"])
+    per_game_table = per_game_table.sort_values(
+        [grouping_column, "game_date", "game_id"], ignore_index=True
+    )
+    return per_game_table
+
+
+def _get_rolling_means(per_game_table: pd.DataFrame, grouping_column: str,
+                       window: Union[int, str]) -> pd.DataFrame:
+    """
+    Read a per game table sorted by grouping_column and date and calculate the rolling
+    means of the form stats within each group.
+
+    Arguments:
+        per_game_table:   A dataframe as returned by _get_per_game_table
+        grouping_column:  Either "player_name" or "team"
+        window:           Either the number of games (e.g. 5) or a time window (e.g. "30D")
+
+    Returns:
+        pd.DataFrame
+    """
+    rolling_means = (
+        per_game_table.set_index("game_date")
+        .groupby(grouping_column, sort=False)[FORM_STATS]
+        .rolling(window, min_periods=1)
+        .mean()
+    )
+    # groupby with sort=False keeps the order of the (already sorted) per game table,
+    # so the rolling means can be aligned positionally
+    rolling_table = per_game_table[[grouping_column, "game_id", "game_date"]].copy()
+    rolling_table[[f"avg_{stat}" for stat in FORM_STATS]] = rolling_means.to_numpy()
+    return rolling_table
+
+
+def get_rolling_stats_table(games_table: pd.DataFrame, grouping_column: str,
+                            window: Union[int, str]) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and calculate, for every game, the average
+    stats of each player or team over a rolling window ending at that game, i.e. their form.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        grouping_column:  Either "player_name" or "team"
+        window:           Either the number of games, e.g. 5 for the last 5 games, or a
+                          time window as a pandas offset string, e.g. "30D" for the last
+                          30 days
+
+    Returns:
+        pd.DataFrame
+    """
+    per_game_table = _get_per_game_table(games_table, grouping_column)
+    return _get_rolling_means(per_game_table, grouping_column, window)
+
+
+def replace_games(games_table: pd.DataFrame, new_games_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and add the data of new games to it. Games
+    that are already included, i.e. have the same game_id, are replaced by their new version.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        new_games_table:  The data of the new (or changed) games
+
+    Returns:
+        pd.DataFrame
+    """
+    return pd.concat(
+        [games_table[~games_table["game_id"].isin(new_games_table["game_id"])], new_games_table]
+    )
+
+
+def _get_update_scope(games_table: pd.DataFrame, new_games_table: pd.DataFrame,
+                      grouping_column: str) -> tuple:
+    """
+    Get what an incremental update of a per game table needs to recompute, i.e. the players
+    or teams of the new games and of the previous versions of the games they replace, and the
+    earliest date of any of these games. Rows from that date on are recomputed.
+
+    Returns:
+        The updated games table, the affected players or teams and the start date
+    """
+    replaced_games_table = games_table[games_table["game_id"].isin(new_games_table["game_id"])]
+    changed_games_table = pd.concat([replaced_games_table, new_games_table])
+    affected = changed_games_table[grouping_column].unique()
+    start_date = pd.to_datetime(changed_games_table["game_date"]).min()
+    return replace_games(games_table, new_games_table), affected, start_date
+
+
+def _merge_updated_rows(table: pd.DataFrame, updated_rows: pd.DataFrame, grouping_column: str,
+                        affected: np.ndarray, start_date: pd.Timestamp) -> pd.DataFrame:
+    """
+    Replace the rows of the affected players or teams from start_date on with the updated rows
+    """
+    stale_mask = table[grouping_column].isin(affected) & (table["game_date"] >= start_date)
+    return pd.concat([table[~stale_mask], updated_rows]).sort_values(
+        [grouping_column, "game_date", "game_id"], ignore_index=True
+    )
+
+
+def _parse_game_dates(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parse the game dates of a per game table, e.g. one that was read back from a csv file
+    """
+    return table.assign(game_date=pd.to_datetime(table["game_date"]))
+
+
+def update_rolling_stats_table(rolling_table: pd.DataFrame, games_table: pd.DataFrame,
+                               new_games_table: pd.DataFrame, grouping_column: str,
+                               window: Union[int, str]) -> pd.DataFrame:
+    """
+    Read an existing rolling stats table and update it with newly arrived games, without
+    recomputing the whole history. New games with the game_id of a game in games_table are
+    changed versions of it and replace it. Only the games of the affected players or teams
+    from the earliest new game on, plus those still within the window before it, are used.
+
+    Arguments:
+        rolling_table:    A dataframe as returned by get_rolling_stats_table
+        games_table:      The games data the rolling table was calculated from. Pass
+                          replace_games(games_table, new_games_table) to the next update
+        new_games_table:  The data of the new games
+        grouping_column:  Either "player_name" or "team"
+        window:           The window rolling_table was calculated with
+
+    Returns:
+        pd.DataFrame
+    """
+    rolling_table = _parse_game_dates(rolling_table)
+    updated_games_table, affected, start_date = _get_update_scope(
+        games_table, new_games_table, grouping_column
+    )
+    per_game_table = _get_per_game_table(
+        updated_games_table[updated_games_table[grouping_column].isin(affected)], grouping_column
+    )
+    history_table = per_game_table[per_game_table["game_date"] < start_date]
+    if isinstance(window, int):
+        history_table = history_table.groupby(grouping_column).tail(window - 1)
+    else:
+        history_table = history_table[
+            history_table["game_date"] > start_date - pd.Timedelta(window)
+        ]
+
+    per_game_table = pd.concat(
+        [history_table, per_game_table[per_game_table["game_date"] >= start_date]]
+    ).sort_values([grouping_column, "game_date", "game_id"], ignore_index=True)
+    updated_rows = _get_rolling_means(per_game_table, grouping_column, window)
+    updated_rows = updated_rows[updated_rows["game_date"] >= start_date]
+    return _merge_updated_rows(rolling_table, updated_rows, grouping_column, affected, start_date)
+
+
+def get_cumulative_stats_table(games_table: pd.DataFrame, grouping_column: str) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and calculate, for every game, the number
+    of games played and the stat totals of each player or team up to and including that game.
+    Averages to date are the totals divided by games_played.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        grouping_column:  Either "player_name" or "team"
+
+    Returns:
+        pd.DataFrame
+    """
+    per_game_table = _get_per_game_table(games_table, grouping_column)
+    cumulative_table = per_game_table[[grouping_column, "game_id", "game_date"]].copy()
+    grouped = per_game_table.groupby(grouping_column, sort=False)
+    cumulative_table["games_played"] = grouped.cumcount() + 1
+    cumulative_table[[f"total_{stat}" for stat in FORM_STATS]] = grouped[FORM_STATS].cumsum()
+    return cumulative_table
+
+
+def update_cumulative_stats_table(cumulative_table: pd.DataFrame, games_table: pd.DataFrame,
+                                  new_games_table: pd.DataFrame,
+                                  grouping_column: str) -> pd.DataFrame:
+    """
+    Read an existing cumulative stats table and update it with newly arrived games, starting
+    from the totals of each player or team before the earliest new game. New games with the
+    game_id of a game in games_table are changed versions of it and replace it.
+
+    Arguments:
+        cumulative_table: A dataframe as returned by get_cumulative_stats_table
+        games_table:      The games data the cumulative table was calculated from. Pass
+                          replace_games(games_table, new_games_table) to the next update
+        new_games_table:  The data of the new games
+        grouping_column:  Either "player_name" or "team"
+
+    Returns:
+        pd.DataFrame
+    """
+    total_columns = ["games_played"] + [f"total_{stat}" for stat in FORM_STATS]
+    cumulative_table = _parse_game_dates(cumulative_table)
+    updated_games_table, affected, start_date = _get_update_scope(
+        games_table, new_games_table, grouping_column
+    )
+    updated_games_table = updated_games_table[updated_games_table[grouping_column].isin(affected)]
+    updated_games_table = updated_games_table[
+        pd.to_datetime(updated_games_table["game_date"]) >= start_date
+    ]
+    updated_rows = get_cumulative_stats_table(updated_games_table, grouping_column)
+
+    previous_rows = cumulative_table[
+        cumulative_table[grouping_column].isin(affected)
+        & (cumulative_table["game_date"] < start_date)
+    ]
+    previous_totals = (
+        previous_rows.sort_values(["game_date", "game_id"])
+        .groupby(grouping_column)[total_columns]
+        .last()
+        .reindex(updated_rows[grouping_column])
+        .fillna(0)
+    )
+    updated_rows[total_columns] += previous_totals.to_numpy()
+    updated_rows["games_played"] = updated_rows["games_played"].astype(int)
+    return _merge_updated_rows(
+        cumulative_table, updated_rows, grouping_column, affected, start_date
+    )
+
+
+def read_data_table(name: str, index_col: Union[int, list] = 0) -> pd.DataFrame:
+    """
+    Read a table from data_tables. Game ids are read as strings, so that all-digit game ids
+    keep their leading zeros
+
+    Arguments:
+        name:       The name of the table, e.g. "player_form_table"
+        index_col:  The index column(s), e.g. [0, 1] for the matchups tables
+
+    Returns:
+        pd.DataFrame
+    """
+    return pd.read_csv(
+        DATA_TABLES_DIR / f"{name}.csv", index_col=index_col, dtype={"game_id": str}
+    )
+
+
+def _write_data_table(table: pd.DataFrame, name: str):
+    """
+    Atomically write a table to data_tables
+    """
+    utils.atomic_write_bytes(DATA_TABLES_DIR / f"{name}.csv", table.to_csv().encode("utf-8"))
+
+
+def update_data_tables(new_games_table: pd.DataFrame):
+    """
+    Update the games, form, cumulative and matchups tables in data_tables with newly ingested
+    (or changed) games, without recomputing them. Nothing is done if data_tables haven't been
+    built yet, i.e. db hasn't been run. The caller must hold the games manifest lock, as
+    ingest_game does, so that concurrent updates don't overwrite each other.
+
+    Arguments:
+        new_games_table: The data of the new games, as written to raw_games_data
+    """
+    if not (DATA_TABLES_DIR / "games_table.csv").exists():
+        return
+    games_table = read_data_table("games_table")
+    # The names in the games table are capitalized by get_games_table
+    new_games_table = new_games_table.assign(
+        player_name=new_games_table["player_name"].apply(lambda x: _capitalize_name(x))
+    )
+    for grouping_column, prefix in [("player_name", "player"), ("team", "team")]:
+        form_table = update_rolling_stats_table(
+            read_data_table(f"{prefix}_form_table"),
+            games_table,
+            new_games_table,
+            grouping_column,
+            FORM_WINDOW,
+        )
+        _write_data_table(form_table, f"{prefix}_form_table")
+        cumulative_table = update_cumulative_stats_table(
+            read_data_table(f"{prefix}_cumulative_table"),
+            games_table,
+            new_games_table,
+            grouping_column,
+        )
+        _write_data_table(cumulative_table, f"{prefix}_cumulative_table")
+        matchups_table = update_matchups_table(
+            read_data_table(f"{prefix}_matchups_table", index_col=[0, 1]),
+            games_table,
+            new_games_table,
+            grouping_column,
+        )
+        _write_data_table(matchups_table, f"{prefix}_matchups_table")
+    # The games table is written last, as it's what the other tables are updated against
+    _write_data_table(replace_games(games_table, new_games_table), "games_table")
+
+
+def _get_team_results(games_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and get, for every team and game, the
+    team's summed stats, its opponent and whether it won the game.
+
+    Arguments:
+        games_table: A dataframe with data from many games
+
+    Returns:
+        pd.DataFrame
+    """
+    team_per_game_table = _get_per_game_table(games_table, "team")
+    opponents_table = team_per_game_table[["game_id", "team", "points"]].rename(
+        columns={"team": "opponent", "points": "opponent_points"}
+    )
+    team_results = team_per_game_table.merge(opponents_table, on="game_id")
+    team_results = team_results[team_results["team"] != team_results["opponent"]].reset_index(
+        drop=True
+    )
+    team_results["won"] = team_results["points"] > team_results["opponent_points"]
+    return team_results
+
+
+def _add_matchup_averages(matchups_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Read a matchups table with totals and (re)calculate the win percentage and the average stats
+    """
+    matchups_table["win_pct"] = matchups_table["wins"] / matchups_table["games_played"]
+    matchups_table[[f"avg_{stat}" for stat in FORM_STATS]] = matchups_table[
+        [f"total_{stat}" for stat in FORM_STATS]
+    ].div(matchups_table["games_played"], axis=0).to_numpy()
+    return matchups_table
+
+
+def get_matchups_table(games_table: pd.DataFrame, grouping_column: str) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and calculate head-to-head aggregates, i.e.
+    how each team does against each opponent or how each player does against each opposing
+    team. The totals are kept along with the averages, so that the table can be updated
+    with new games by update_matchups_table.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        grouping_column:  Either "team" for team vs team or "player_name" for player vs
+                          opposing team matchups
+
+    Returns:
+        pd.DataFrame indexed by (grouping_column, "opponent")
+    """
+    team_results = _get_team_results(games_table)
+    if grouping_column == "team":
+        per_game_table = team_results
+    else:
+        per_game_table = games_table.merge(
+            team_results[["game_id", "team", "opponent", "won"]], on=["game_id", "team"]
+        )
+
+    grouped = per_game_table.groupby([grouping_column, "opponent"])
+    matchups_table = grouped[FORM_STATS].sum().add_prefix("total_")
+    matchups_table.insert(0, "games_played", grouped.size())
+    matchups_table.insert(1, "wins", grouped["won"].sum().astype(int))
+    return _add_matchup_averages(matchups_table)
+
+
+def update_matchups_table(matchups_table: pd.DataFrame, games_table: pd.DataFrame,
+                          new_games_table: pd.DataFrame, grouping_column: str) -> pd.DataFrame:
+    """
+    Read an existing matchups table and add the aggregates of newly arrived games to it,
+    without going through the whole history again. New games with the game_id of a game in
+    games_table are changed versions of it, so the aggregates of the previous version are
+    subtracted first.
+
+    Arguments:
+        matchups_table:   A dataframe as returned by get_matchups_table
+        games_table:      The games data the matchups table was calculated from. Pass
+                          replace_games(games_table, new_games_table) to the next update
+        new_games_table:  The data of the new games
+        grouping_column:  Either "team" or "player_name"
+
+    Returns:
+        pd.DataFrame indexed by (grouping_column, "opponent")
+    """
+    total_columns = ["games_played", "wins"] + [f"total_{stat}" for stat in FORM_STATS]
+    updated_matchups_table = matchups_table[total_columns].add(
+        get_matchups_table(new_games_table, grouping_column)[total_columns], fill_value=0
+    )
+    replaced_games_table = games_table[games_table["game_id"].isin(new_games_table["game_id"])]
+    if not replaced_games_table.empty:
+        updated_matchups_table = updated_matchups_table.sub(
+            get_matchups_table(replaced_games_table, grouping_column)[total_columns],
+            fill_value=0,
+        )
+        # Pairs that only met in a replaced game may no longer have any games
+        updated_matchups_table = updated_matchups_table[updated_matchups_table["games_played"] > 0]
+    updated_matchups_table[["games_played", "wins"]] = updated_matchups_table[
+        ["games_played", "wins"]
+    ].astype(int)
+    return _add_matchup_averages(updated_matchups_table)
+
+
+def _safe_divide(numerator: pd.Series, denominator: pd.Series) -> np.ndarray:
+    """
+    Divide two series element-wise, returning NaN wherever the denominator is 0
+    """
+    numerator = numerator.to_numpy(dtype=float)
+    denominator = denominator.to_numpy(dtype=float)
+    return np.divide(
+        numerator, denominator, out=np.full_like(numerator, np.nan), where=denominator != 0
+    )
+
+
+def get_derived_metrics_table(games_table: pd.DataFrame, grouping_column: str) -> pd.DataFrame:
+    """
+    Read a dataframe with data from many games and calculate efficiency metrics, i.e. true
+    shooting percentage, points per minute and assist to turnover ratio, along with the
+    league-wide percentile rank of each player or team for every metric and average. A higher
+    percentile rank is always better, i.e. for LOWER_IS_BETTER_METRICS the lowest values rank
+    highest.
+    Metrics of players or teams below the minimum volumes (MIN_GAMES, MIN_MINUTES and
+    MIN_SHOT_ATTEMPTS) are NaN and are not ranked. Unlike get_stats_table, NaN values are
+    kept as such, so all metric columns are numeric.
+
+    Arguments:
+        games_table:      A dataframe with data from many games
+        grouping_column:  Either "player_name" or "team"
+
+    Returns:
+        pd.DataFrame
+    """
+    per_game_table = _get_per_game_table(games_table, grouping_column)
+    grouped = per_game_table.groupby(grouping_column)
+    totals = grouped[FORM_STATS].sum()
+
+    metrics_table = pd.DataFrame(index=totals.index)
+    metrics_table["games_played"] = grouped.size()
+    metrics_table["minutes"] = totals["duration"] / 60
+    metrics_table["avg_points"] = totals["points"] / metrics_table["games_played"]
+    metrics_table["avg_rebounds"] = (
+        totals["offensive_rebounds"] + totals["defensive_rebounds"]
+    ) / metrics_table["games_played"]
+    for stat in ["assists", "steals", "blocks", "turnovers"]:
+        metrics_table[f"avg_{stat}"] = totals[stat] / metrics_table["games_played"]
+
+    field_goals_attempted = totals["two_point_attempted"] + totals["three_point_attempted"]
+    shot_attempts = field_goals_attempted + totals["free_throws_attempted"]
+    metrics_table["true_shooting_pct"] = _safe_divide(
+        totals["points"], 2 * (field_goals_attempted + 0.44 * totals["free_throws_attempted"])
+    )
+    metrics_table["points_per_minute"] = _safe_divide(totals["points"], metrics_table["minutes"])
+    metrics_table["assist_turnover_ratio"] = _safe_divide(totals["assists"], totals["turnovers"])
+
+    qualified = (metrics_table["games_played"] >= MIN_GAMES).to_numpy()
+    metrics_table.loc[~qualified | (shot_attempts < MIN_SHOT_ATTEMPTS).to_numpy(),
+                      "true_shooting_pct"] = np.nan
+    metrics_table.loc[~qualified | (metrics_table["minutes"] < MIN_MINUTES).to_numpy(),
+                      "points_per_minute"] = np.nan
+    metrics_table.loc[~qualified, "assist_turnover_ratio"] = np.nan
+
+    ranked_columns = metrics_table.columns.drop(["games_played", "minutes"])
+    percentile_ranks = metrics_table.loc[qualified, ranked_columns].rank(pct=True)
+    percentile_ranks[LOWER_IS_BETTER_METRICS] = metrics_table.loc[
+        qualified, LOWER_IS_BETTER_METRICS
+    ].rank(pct=True, ascending=False)
+    metrics_table[[f"{column}_pct_rank" for column in ranked_columns]] = percentile_ranks.reindex(
+        metrics_table.index
+    ).to_numpy()
+    return metrics_table.reset_index()
+
+
 if __name__ == "__main__":
     games_table = get_games_table()
     players_table = get_players_table(games_table)
     teams_table = get_teams_table(games_table)
     player_stats_table = get_stats_table(games_table, "player_name")
     team_stats_table = get_stats_table(games_table, "team")
+    player_form_table = get_rolling_stats_table(games_table, "player_name", FORM_WINDOW)
+    team_form_table = get_rolling_stats_table(games_table, "team", FORM_WINDOW)
+    player_cumulative_table = get_cumulative_stats_table(games_table, "player_name")
+    team_cumulative_table = get_cumulative_stats_table(games_table, "team")
+    team_matchups_table = get_matchups_table(games_table, "team")
+    player_matchups_table = get_matchups_table(games_table, "player_name")
+    player_metrics_table = get_derived_metrics_table(games_table, "player_name")
+    team_metrics_table = get_derived_metrics_table(games_table, "team")
     games_table.to_csv(DATA_DIR / "data_tables" / "games_table.csv")
     players_table.to_csv(DATA_DIR / "data_tables" / "players_table.csv")
     teams_table.to_csv(DATA_DIR / "data_tables" / "teams_table.csv")
     player_stats_table.to_csv(DATA_DIR / "data_tables" / "player_stats_table.csv")
     team_stats_table.to_csv(DATA_DIR / "data_tables" / "team_stats_table.csv")
+    player_form_table.to_csv(DATA_DIR / "data_tables" / "player_form_table.csv")
+    team_form_table.to_csv(DATA_DIR / "data_tables" / "team_form_table.csv")
+    player_cumulative_table.to_csv(DATA_DIR / "data_tables" / "player_cumulative_table.csv")
+    team_cumulative_table.to_csv(DATA_DIR / "data_tables" / "team_cumulative_table.csv")
+    team_matchups_table.to_csv(DATA_DIR / "data_tables" / "team_matchups_table.csv")
+    player_matchups_table.to_csv(DATA_DIR / "data_tables" / "player_matchups_table.csv")
+    player_metrics_table.to_csv(DATA_DIR / "data_tables" / "player_metrics_table.csv")
+    team_metrics_table.to_csv(DATA_DIR / "data_tables" / "team_metrics_table.csv")
@@ -6,3 +6,5 @@ SRC_DIR = pathlib.Path(__file__).parent.parent
 DATA_DIR = SRC_DIR.parent / "esake_scraper" / "data"
 
 TESTS_DATA_DIR = SRC_DIR.parent.parent / "tests" / "data"
+
+FRONT_END_DIR = SRC_DIR.parent.parent / "front_end"
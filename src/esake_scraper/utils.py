@@ -1,4 +1,12 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import pathlib
 import re
+import uuid
+
+import pandas as pd
 from bs4 import BeautifulSoup
 
 
@@ -7,6 +15,45 @@ def get_game_id_list(game_view_soup: BeautifulSoup) -> list:
     return game_id_list
 
 
+def get_fingerprint(players_data_df: pd.DataFrame) -> str:
+    """
+    Read the players' data of a game and return a hash of its normalized stat rows, so
+    that identical scrapes of the same game have the same fingerprint regardless of row order.
+    """
+    normalized_df = players_data_df.sort_values(["team", "player_name"], ignore_index=True)
+    return hashlib.sha256(normalized_df.to_csv(index=False).encode("utf-8")).hexdigest()
+
+
+@contextlib.contextmanager
+def file_lock(lock_path: pathlib.Path):
+    """
+    Hold an exclusive lock on a lock file for the duration of the context, so that
+    read-modify-write sequences of several processes don't interleave. POSIX record locks
+    are used, as these also work over NFS, provided the server supports locking.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        fcntl.lockf(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.lockf(lock_file, fcntl.LOCK_UN)
+
+
+def atomic_write_bytes(path: pathlib.Path, data: bytes):
+    """
+    Write data to a temporary file next to path and move it in place, so that readers
+    never see a partially written file
+    """
+    tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
 class GameIdError(Exception):
     pass
 
@@ -0,0 +1,66 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import pandas as pd
+
+from esake_scraper.GameArchive import GameArchive, reprocess
+from esake_scraper.PlayersData import PlayersData
+from esake_scraper.shared.common_paths import TESTS_DATA_DIR
+
+with open(TESTS_DATA_DIR / "dummy_soup.pickle", "rb") as f:
+    DUMMY_GAME_ID_SOUP = pickle.load(f)
+
+
+def test_game_archive(tmp_path):
+    game_archive = GameArchive(tmp_path)
+    game_archive.append("00F123", DUMMY_GAME_ID_SOUP)
+    game_archive.append("00F124", ["ΑΕΚ", "ΑΡΗΣ"])
+    game_archive.append("00F124", ["ΑΕΚ", "ΠΑΟΚ"])
+
+    # A newly opened archive reads the offsets from the index file
+    game_archive = GameArchive(tmp_path)
+    assert game_archive.game_ids() == ["00F123", "00F124"]
+    assert game_archive.get("00F123") == [str(node) for node in DUMMY_GAME_ID_SOUP]
+    assert game_archive.get("00F124") == ["ΑΕΚ", "ΠΑΟΚ"]
+
+
+def _append_games(archive_dir, game_ids):
+    game_archive = GameArchive(archive_dir)
+    for game_id in game_ids:
+        game_archive.append(game_id, [f"{game_id} SHOTS"] * 100)
+
+
+def test_game_archive_concurrent_appends(tmp_path):
+    game_ids = [[f"{worker:02d}{game:06d}" for game in range(25)] for worker in range(8)]
+    with ProcessPoolExecutor(max_workers=8) as executor:
+        list(executor.map(_append_games, [tmp_path] * 8, game_ids))
+    game_archive = GameArchive(tmp_path)
+    assert sorted(game_archive.game_ids()) == sorted(sum(game_ids, []))
+    for game_id in sum(game_ids, []):
+        assert game_archive.get(game_id) == [f"{game_id} SHOTS"] * 100
+
+
+def test_reprocess(tmp_path):
+    game_archive = GameArchive(tmp_path)
+    game_archive.append("00F123", DUMMY_GAME_ID_SOUP)
+    # A game that can't be parsed is skipped
+    game_archive.append("00F124", ["ΑΕΚ SHOTS", "ΑΡΗΣ SHOTS"])
+
+    returned_data = reprocess(tmp_path, to_csv=False, n_workers=1)
+    expected_data = PlayersData("00F123", DUMMY_GAME_ID_SOUP, False).players_data_df_
+    pd.testing.assert_frame_equal(returned_data, expected_data)
+
+
+def test_reprocess_ingests_in_parent(tmp_path):
+    game_archive = GameArchive(tmp_path / "game_archive")
+    game_archive.append("00F123", DUMMY_GAME_ID_SOUP)
+    with mock.patch("esake_scraper.GameArchive.db.ingest_game") as mock_ingest_game:
+        returned_data = reprocess(tmp_path / "game_archive", to_csv=True, n_workers=2)
+    mock_ingest_game.assert_called_once()
+    assert mock_ingest_game.call_args[0][1] == "00F123"
+    pd.testing.assert_frame_equal(mock_ingest_game.call_args[0][0], returned_data)
+
+
+def test_reprocess_empty_archive(tmp_path):
+    assert reprocess(tmp_path, to_csv=False).empty
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from esake_scraper.GamesTensor import GamesTensor, write_games_tensor
+from esake_scraper.shared.common_paths import TESTS_DATA_DIR
+
+
+def test_games_tensor(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    other_player_data = dummy_games_data.iloc[[0]].copy()
+    other_player_data["player_name"] = "ΜΠΕΤΣ ΑΝΤΡΙΟΥ"
+    other_player_data["points"] = 12.0
+    # A name with digits is left out of the players table, which leaves a gap in its ids
+    invalid_player_data = dummy_games_data.iloc[[1]].copy()
+    invalid_player_data["player_name"] = "00-09-87-09"
+    write_games_tensor(
+        pd.concat([dummy_games_data, invalid_player_data, other_player_data]), tmp_path
+    )
+
+    games_tensor = GamesTensor(tmp_path)
+    assert games_tensor.tensor_.shape == (2, 2, 16)
+    assert list(games_tensor.players_table_["id"]) == [0, 2]
+    points = games_tensor.get(stats=["points"])
+    assert points.shape == (2, 2, 1)
+    np.testing.assert_array_equal(points[:, :, 0], [[0.0, 15.0], [12.0, np.nan]])
+
+    returned_data = games_tensor.get(["ΜΠΕΤΣ ΑΝΤΡΙΟΥ"], ["0010542C"], ["points", "duration"])
+    np.testing.assert_array_equal(returned_data, [[[12.0, 662.0]]])
+
+    stat_table = games_tensor.get_stat_table("points")
+    assert stat_table.loc["ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ", "0010A245"] == 15.0
+
+    with pytest.raises(KeyError):
+        games_tensor.get(stats=["dunks"])
+
+
+def test_games_tensor_rewrite(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    write_games_tensor(dummy_games_data.iloc[[0]], tmp_path)
+    games_tensor = GamesTensor(tmp_path)
+
+    # Rewriting the tensor switches new readers to it and leaves the opened one intact
+    for _ in range(3):
+        write_games_tensor(dummy_games_data, tmp_path)
+    assert GamesTensor(tmp_path).tensor_.shape == (1, 2, 16)
+    assert games_tensor.tensor_.shape == (1, 1, 16)
+    assert games_tensor.get(stats=["points"])[0, 0, 0] == 0.0
+    # Only the current and the previous generation are kept
+    assert len(list(tmp_path.glob("tensor.*.dat"))) == 2
+
+    with pytest.raises(ValueError, match="Duplicate rows"):
+        write_games_tensor(pd.concat([dummy_games_data, dummy_games_data.iloc[[0]]]), tmp_path)
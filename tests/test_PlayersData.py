@@ -4,7 +4,7 @@ import pickle
 import bs4
 import pandas as pd
 
-from esake_scraper.PlayersData import PlayersData
+from esake_scraper.PlayersData import PlayersData, prune_parse_cache
 from esake_scraper.shared.common_paths import TESTS_DATA_DIR
 import pandas.api.types as ptypes
 
@@ -71,3 +71,34 @@ def test_players_data():
             "defensive_rebounds",
         ]
     )
+
+
+def test_players_data_parse_cache(tmp_path):
+    with mock.patch("esake_scraper.PlayersData.PARSE_CACHE_DIR", tmp_path):
+        expected_pld = PlayersData("00F123", DUMMY_GAME_ID_SOUP, False, use_cache=True)
+        assert len(list((tmp_path / "v1").iterdir())) == 1
+
+        with mock.patch.object(PlayersData, "get_players") as mock_get_players:
+            returned_pld = PlayersData("00F123", DUMMY_GAME_ID_SOUP, False, use_cache=True)
+            mock_get_players.assert_not_called()
+        assert returned_pld.teams_list_ == expected_pld.teams_list_
+        assert returned_pld.players_list_ == expected_pld.players_list_
+        pd.testing.assert_frame_equal(returned_pld.players_data_df_, expected_pld.players_data_df_)
+
+        # Bumping the parser version invalidates the cached results
+        with mock.patch("esake_scraper.PlayersData.PARSER_VERSION", 2):
+            PlayersData("00F123", DUMMY_GAME_ID_SOUP, False, use_cache=True)
+            assert len(list((tmp_path / "v2").iterdir())) == 1
+            prune_parse_cache()
+        assert [path.name for path in tmp_path.iterdir()] == ["v2"]
+
+        # A truncated entry, e.g. from a crashed write, is a cache miss and is rewritten
+        with mock.patch("esake_scraper.PlayersData.PARSER_VERSION", 2):
+            (cache_path,) = (tmp_path / "v2").iterdir()
+            cache_path.write_bytes(cache_path.read_bytes()[:100])
+            returned_pld = PlayersData("00F123", DUMMY_GAME_ID_SOUP, False, use_cache=True)
+            pd.testing.assert_frame_equal(
+                returned_pld.players_data_df_, expected_pld.players_data_df_
+            )
+            with open(cache_path, "rb") as f:
+                pd.testing.assert_frame_equal(pickle.load(f), expected_pld.players_data_df_)
@@ -25,11 +25,35 @@ def test_soup_parser_raises_season_error():
     ],
 )
 def test_soup_parser(season, is_game_id, game_id):
-    with mock.patch("selenium.webdriver.ChromeOptions") as mock_options:
-        with mock.patch("selenium.webdriver.Chrome") as mock_chrome:
-            with mock.patch("esake_scraper.SoupParser.BeautifulSoup") as mock_soup:
-                esp.SoupParser(season, "01", is_game_id, game_id)
-                if is_game_id:
-                    mock_options.assert_called()
-                    mock_chrome.assert_called()
-                mock_soup.assert_called()
+    with mock.patch("esake_scraper.SoupParser.requests.get") as mock_get:
+        with mock.patch("selenium.webdriver.ChromeOptions") as mock_options:
+            with mock.patch("selenium.webdriver.Chrome") as mock_chrome:
+                with mock.patch("esake_scraper.SoupParser.BeautifulSoup") as mock_soup:
+                    with mock.patch("esake_scraper.SoupParser.time.sleep"):
+                        esp.SoupParser(season, "01", is_game_id, game_id)
+                    mock_get.assert_called()
+                    if is_game_id:
+                        # The mocked page has no box score, so the headless browser is used
+                        mock_options.assert_called()
+                        mock_chrome.assert_called()
+                    mock_soup.assert_called()
+
+
+@pytest.mark.parametrize(
+    "html, uses_headless",
+    [
+        ("<html><p>ΑΕΚ SHOTS</p><p>ΣΥΝΟΛΟ</p></html>".encode("utf-8"), False),
+        ("<html><p>Loading...</p></html>".encode("utf-8"), True),
+    ],
+)
+def test_soup_parser_game_fetch_fallback(html, uses_headless):
+    esp.FETCH_STATS.clear()
+    with mock.patch("esake_scraper.SoupParser.requests.get") as mock_get:
+        mock_get.return_value.content = html
+        with mock.patch("selenium.webdriver.ChromeOptions"):
+            with mock.patch("selenium.webdriver.Chrome") as mock_chrome:
+                mock_chrome.return_value.page_source = html
+                with mock.patch("esake_scraper.SoupParser.time.sleep"):
+                    esp.SoupParser("regular", "01", True, "wer")
+                assert mock_chrome.called == uses_headless
+    assert esp.FETCH_STATS == {"headless" if uses_headless else "plain": 1}
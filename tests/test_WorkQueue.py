@@ -0,0 +1,82 @@
+import sqlite3
+import time
+from unittest import mock
+
+from esake_scraper.GameArchive import GameArchive
+from esake_scraper.WorkQueue import WorkQueue, add_series_tasks, run_worker
+
+
+def test_work_queue_claim_order(tmp_path):
+    work_queue = WorkQueue(tmp_path / "work_queue.sqlite")
+    add_series_tasks(work_queue, "regular", [1, 2])
+    work_queue.add_task("game", "regular", 1, "0010542C", priority=-99)
+    # Adding the same task again has no effect
+    work_queue.add_task("game", "regular", 1, "0010542C", priority=-99)
+
+    claimed_tasks = [work_queue.claim(f"worker_{idx}") for idx in range(4)]
+    assert [(task["kind"], task["series"]) for task in claimed_tasks[:3]] == [
+        ("game", 1),
+        ("series", 1),
+        ("series", 2),
+    ]
+    assert claimed_tasks[3] is None
+    assert work_queue.get_status_counts() == {"leased": 3}
+
+
+def test_work_queue_reclaims_expired_leases(tmp_path):
+    work_queue = WorkQueue(tmp_path / "work_queue.sqlite", lease_seconds=10, max_attempts=2)
+    work_queue.add_task("series", "regular", 1)
+    task = work_queue.claim("dead_worker")
+    assert work_queue.claim("worker") is None
+
+    with mock.patch("esake_scraper.WorkQueue.time.time", return_value=task["lease_expires"] + 11):
+        assert work_queue.claim("worker")["id"] == task["id"]
+        assert not work_queue.heartbeat(task["id"], "dead_worker")
+        assert work_queue.heartbeat(task["id"], "worker")
+
+    # The task has now been attempted max_attempts times, so failing it is final
+    work_queue.fail(task["id"], "worker", "ConnectionError()")
+    assert work_queue.get_status_counts() == {"failed": 1}
+    assert work_queue.claim("worker") is None
+
+
+def test_run_worker(tmp_path):
+    work_queue = WorkQueue(tmp_path / "work_queue.sqlite")
+    game_archive = GameArchive(tmp_path / "game_archive")
+    add_series_tasks(work_queue, "regular", [1])
+    with mock.patch("esake_scraper.crawl.SoupParser") as mock_soup_parser:
+        mock_soup_parser.return_value.soup_ = ["ΑΕΚ SHOTS"]
+        with mock.patch("esake_scraper.crawl.PlayersData") as mock_players_data:
+            with mock.patch(
+                "esake_scraper.crawl.utils.get_game_id_list",
+                return_value=["0010542C", "0010A245", "0010811B"],
+            ):
+                mock_players_data.side_effect = [ValueError(), None, None]
+                run_worker(work_queue, game_archive, "worker")
+    # The series, both games and the retry of the game that failed once. The game known
+    # to be bad is skipped without being fetched
+    assert mock_soup_parser.call_count == 4
+    assert work_queue.get_status_counts() == {"done": 4}
+    assert sorted(game_archive.game_ids()) == ["0010542C", "0010A245"]
+    mock_players_data.assert_called_with("0010A245", ["ΑΕΚ SHOTS"], True, use_cache=True)
+
+
+def test_run_worker_retries_failed_heartbeats(tmp_path):
+    work_queue = WorkQueue(tmp_path / "work_queue.sqlite")
+    work_queue.add_task("game", "regular", 1, "0010542C")
+    heartbeat = work_queue.heartbeat
+    heartbeat_errors = [sqlite3.OperationalError("database is locked")] * 2
+
+    def flaky_heartbeat(task_id, worker_id):
+        if heartbeat_errors:
+            raise heartbeat_errors.pop()
+        return heartbeat(task_id, worker_id)
+
+    with mock.patch.object(work_queue, "heartbeat", side_effect=flaky_heartbeat) as mock_heartbeat:
+        with mock.patch(
+            "esake_scraper.WorkQueue._run_task", side_effect=lambda *args: time.sleep(0.5)
+        ):
+            run_worker(work_queue, GameArchive(tmp_path / "game_archive"), "worker", 0.05)
+    # The heartbeats went on after the failed ones
+    assert mock_heartbeat.call_count > 3
+    assert work_queue.get_status_counts() == {"done": 1}
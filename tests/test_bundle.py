@@ -0,0 +1,73 @@
+import gzip
+import json
+import pathlib
+
+from unittest import mock
+
+import pandas as pd
+
+from esake_scraper import bundle
+from esake_scraper.shared.common_paths import TESTS_DATA_DIR
+
+
+def _get_dummy_games_data() -> pd.DataFrame:
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    opponent_data = dummy_games_data.copy()
+    opponent_data["team"] = "ΑΡΗΣ"
+    opponent_data["player_name"] = "ΜΠΕΤΣ ΑΝΤΡΙΟΥ"
+    return pd.concat([dummy_games_data, opponent_data], ignore_index=True)
+
+
+def test_build_bundle(tmp_path):
+    dummy_games_data = _get_dummy_games_data()
+    manifest = bundle.build_bundle(dummy_games_data, tmp_path)
+    assert sorted(manifest["players"]) == ["ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ", "ΜΠΕΤΣ ΑΝΤΡΙΟΥ"]
+    assert sorted(manifest["teams"]) == ["ΑΡΗΣ", "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ"]
+    with open(tmp_path / "manifest.json", encoding="utf-8") as f:
+        assert json.load(f) == manifest
+
+    shard_path = tmp_path / manifest["players"]["ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ"]
+    shard = json.loads(gzip.decompress((tmp_path / f"{shard_path}.gz").read_bytes()))
+    assert shard["stats"]["avg_points"] == 7.5
+    assert shard["matchups"][0]["opponent"] == "ΑΡΗΣ"
+
+    # Only the shards whose contents changed are rewritten, and the shards of the previous
+    # manifest are kept for clients that still hold it
+    shard_mtimes = {path.name: path.stat().st_mtime_ns for path in (tmp_path / "shards").iterdir()}
+    dummy_games_data.loc[dummy_games_data["player_name"] == "ΜΠΕΤΣ ΑΝΤΡΙΟΥ", "assists"] = 5.0
+    new_manifest = bundle.build_bundle(dummy_games_data, tmp_path)
+    assert new_manifest["players"]["ΜΠΕΤΣ ΑΝΤΡΙΟΥ"] != manifest["players"]["ΜΠΕΤΣ ΑΝΤΡΙΟΥ"]
+    assert (tmp_path / manifest["players"]["ΜΠΕΤΣ ΑΝΤΡΙΟΥ"]).exists()
+    assert (tmp_path / shard_path).stat().st_mtime_ns == shard_mtimes[shard_path.name]
+
+    # Shards older than the previous manifest are removed
+    dummy_games_data.loc[dummy_games_data["player_name"] == "ΜΠΕΤΣ ΑΝΤΡΙΟΥ", "assists"] = 6.0
+    bundle.build_bundle(dummy_games_data, tmp_path)
+    assert not (tmp_path / manifest["players"]["ΜΠΕΤΣ ΑΝΤΡΙΟΥ"]).exists()
+    assert (tmp_path / new_manifest["players"]["ΜΠΕΤΣ ΑΝΤΡΙΟΥ"]).exists()
+    assert not list((tmp_path / "shards").glob(".*.tmp"))
+
+
+def test_build_bundle_writes_manifest_before_pruning(tmp_path):
+    dummy_games_data = _get_dummy_games_data()
+    for assists in [1.0, 2.0]:
+        bundle.build_bundle(dummy_games_data.assign(assists=assists), tmp_path)
+
+    events = []
+    write_compressed = bundle._write_compressed
+    unlink = pathlib.Path.unlink
+
+    def record_write(path, data):
+        events.append(("write", path.name))
+        write_compressed(path, data)
+
+    def record_unlink(path):
+        events.append(("unlink", path.name))
+        unlink(path)
+
+    with mock.patch.object(bundle, "_write_compressed", side_effect=record_write):
+        with mock.patch.object(pathlib.Path, "unlink", autospec=True, side_effect=record_unlink):
+            bundle.build_bundle(dummy_games_data.assign(assists=3.0), tmp_path)
+    manifest_idx = events.index(("write", "manifest.json"))
+    assert all(event == "write" for event, _ in events[:manifest_idx])
+    assert any(event == "unlink" for event, _ in events[manifest_idx:])
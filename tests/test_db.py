@@ -1,8 +1,12 @@
+import os
 import unittest.mock as mock
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
+import pytest
 
 from esake_scraper import db
+import pandas.api.types as ptypes
 from pandas.testing import assert_frame_equal
 from esake_scraper.shared.common_paths import TESTS_DATA_DIR
 
@@ -11,9 +15,10 @@ DUMMY_GAMES_DATA = pd.read_csv(TESTS_DATA_DIR / "dummy_games_data.csv", index_co
 
 def test_get_games_data():
     expected_data = DUMMY_GAMES_DATA
-    with mock.patch("pandas.read_csv") as mock_pandas:
-        mock_pandas.return_value = pd.DataFrame(
-            data=[["ΑΕΚ", "ΜΠΕΤΣ Άντριου", 1393.0]], columns=["team", "player_name", "duration"]
+    with mock.patch("esake_scraper.db._read_game_file") as mock_read_game_file:
+        mock_read_game_file.return_value = pd.DataFrame(
+            data=[["ΑΕΚ", "ΜΠΕΤΣ Άντριου", 1393.0, "0010542C"]],
+            columns=["team", "player_name", "duration", "game_id"],
         )
         returned_data = db.get_games_table()
         assert_frame_equal(returned_data.iloc[[0]], expected_data)
@@ -51,3 +56,305 @@ def test_get_stats_table():
     assert float(returned_team_data["free_throws_pct"].iloc[1]) == float(expected_team_data["free_throws_pct"].iloc[1])
     assert_frame_equal(returned_team_data.drop("free_throws_pct", axis=1),
                        expected_team_data.drop("free_throws_pct", axis=1))
+
+
+def test_get_rolling_stats_table():
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    returned_data = db.get_rolling_stats_table(dummy_games_data, "player_name", 1)
+    assert list(returned_data["avg_points"]) == [0.0, 15.0]
+
+    returned_data = db.get_rolling_stats_table(dummy_games_data, "player_name", 2)
+    assert list(returned_data["avg_points"]) == [0.0, 7.5]
+
+    # The two games are 14 days apart
+    returned_data = db.get_rolling_stats_table(dummy_games_data, "player_name", "7D")
+    assert list(returned_data["avg_points"]) == [0.0, 15.0]
+    returned_data = db.get_rolling_stats_table(dummy_games_data, "player_name", "30D")
+    assert list(returned_data["avg_points"]) == [0.0, 7.5]
+
+
+def test_update_rolling_stats_table():
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    for window in [2, "30D"]:
+        expected_data = db.get_rolling_stats_table(dummy_games_data, "team", window)
+        rolling_table = db.get_rolling_stats_table(dummy_games_data.iloc[[0]], "team", window)
+        returned_data = db.update_rolling_stats_table(
+            rolling_table, dummy_games_data.iloc[[0]], dummy_games_data.iloc[[1]], "team", window
+        )
+        assert_frame_equal(returned_data, expected_data)
+
+
+def test_update_rolling_stats_table_with_changed_game():
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    # A re-ingested version of the earlier game, which also changes the later game's form
+    changed_game_data = dummy_games_data.iloc[[0]].assign(points=5.0)
+    updated_games_data = db.replace_games(dummy_games_data, changed_game_data)
+    for window in [2, "30D"]:
+        expected_data = db.get_rolling_stats_table(updated_games_data, "player_name", window)
+        rolling_table = db.get_rolling_stats_table(dummy_games_data, "player_name", window)
+        returned_data = db.update_rolling_stats_table(
+            rolling_table, dummy_games_data, changed_game_data, "player_name", window
+        )
+        assert_frame_equal(returned_data, expected_data)
+        assert list(returned_data["avg_points"]) == [5.0, 10.0]
+
+
+def test_update_cumulative_stats_table():
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    expected_data = db.get_cumulative_stats_table(dummy_games_data, "player_name")
+    assert list(expected_data["games_played"]) == [1, 2]
+    assert list(expected_data["total_points"]) == [0.0, 15.0]
+
+    cumulative_table = db.get_cumulative_stats_table(dummy_games_data.iloc[[0]], "player_name")
+    returned_data = db.update_cumulative_stats_table(
+        cumulative_table, dummy_games_data.iloc[[0]], dummy_games_data.iloc[[1]], "player_name"
+    )
+    assert_frame_equal(returned_data, expected_data)
+
+    # A changed game replaces its previous version instead of being counted twice
+    changed_game_data = dummy_games_data.iloc[[0]].assign(points=5.0)
+    expected_data = db.get_cumulative_stats_table(
+        db.replace_games(dummy_games_data, changed_game_data), "player_name"
+    )
+    returned_data = db.update_cumulative_stats_table(
+        returned_data, dummy_games_data, changed_game_data, "player_name"
+    )
+    assert_frame_equal(returned_data, expected_data)
+    assert list(returned_data["games_played"]) == [1, 2]
+    assert list(returned_data["total_points"]) == [5.0, 20.0]
+
+
+def _patch_data_dir(tmp_path):
+    return mock.patch.multiple(
+        db,
+        DATA_DIR=tmp_path,
+        GAMES_MANIFEST_PATH=tmp_path / "games_manifest.csv",
+        GAMES_MANIFEST_LOCK_PATH=tmp_path / "games_manifest.lock",
+        DATA_TABLES_DIR=tmp_path / "data_tables",
+    )
+
+
+def test_ingest_game(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    with _patch_data_dir(tmp_path):
+        assert db.ingest_game(dummy_games_data.iloc[[0]], "0010542C")
+        # An identical re-scrape is skipped
+        assert not db.ingest_game(dummy_games_data.iloc[[0]], "0010542C")
+        # A changed game replaces the previous version
+        assert db.ingest_game(dummy_games_data.iloc[[1]], "0010542C")
+        assert db.ingest_game(dummy_games_data.iloc[[1]], "0010A245")
+        assert sorted(os.listdir(tmp_path / "raw_games_data")) == ["0010542C.csv", "0010A245.csv"]
+        assert len(db.get_games_manifest()) == 2
+
+
+def test_update_form_tables_read_from_csv(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    db.get_rolling_stats_table(dummy_games_data.iloc[[0]], "player_name", 5).to_csv(
+        tmp_path / "player_form_table.csv"
+    )
+    db.get_cumulative_stats_table(dummy_games_data.iloc[[0]], "player_name").to_csv(
+        tmp_path / "player_cumulative_table.csv"
+    )
+    returned_data = db.update_rolling_stats_table(
+        pd.read_csv(tmp_path / "player_form_table.csv", index_col=0),
+        dummy_games_data.iloc[[0]],
+        dummy_games_data.iloc[[1]],
+        "player_name",
+        5,
+    )
+    assert_frame_equal(
+        returned_data, db.get_rolling_stats_table(dummy_games_data, "player_name", 5)
+    )
+    returned_data = db.update_cumulative_stats_table(
+        pd.read_csv(tmp_path / "player_cumulative_table.csv", index_col=0),
+        dummy_games_data.iloc[[0]],
+        dummy_games_data.iloc[[1]],
+        "player_name",
+    )
+    assert_frame_equal(returned_data, db.get_cumulative_stats_table(dummy_games_data, "player_name"))
+
+
+def test_ingest_game_updates_data_tables(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    opponent_data = dummy_games_data.assign(
+        team="ΑΡΗΣ", player_name="ΜΠΕΤΣ ΑΝΤΡΙΟΥ", points=[10.0, 20.0]
+    )
+    first_game_data = pd.concat([dummy_games_data.iloc[[0]], opponent_data.iloc[[0]]])
+    second_game_data = pd.concat([dummy_games_data.iloc[[1]], opponent_data.iloc[[1]]])
+    with _patch_data_dir(tmp_path):
+        # Ingesting before data_tables have been built only writes the game
+        db.ingest_game(first_game_data, "0010542C")
+        (tmp_path / "data_tables").mkdir()
+        games_table = db.get_games_table()
+        games_table.to_csv(tmp_path / "data_tables" / "games_table.csv")
+        for grouping_column, prefix in [("player_name", "player"), ("team", "team")]:
+            db.get_rolling_stats_table(games_table, grouping_column, db.FORM_WINDOW).to_csv(
+                tmp_path / "data_tables" / f"{prefix}_form_table.csv"
+            )
+            db.get_cumulative_stats_table(games_table, grouping_column).to_csv(
+                tmp_path / "data_tables" / f"{prefix}_cumulative_table.csv"
+            )
+            db.get_matchups_table(games_table, grouping_column).to_csv(
+                tmp_path / "data_tables" / f"{prefix}_matchups_table.csv"
+            )
+
+        db.ingest_game(second_game_data, "0010A245")
+        # A changed version of an ingested game, which ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ now wins, replaces it
+        db.ingest_game(first_game_data.assign(points=[30.0, 10.0]), "0010542C")
+        games_table = db.get_games_table()
+        assert_frame_equal(
+            db.read_data_table("games_table").sort_values(["game_id", "team"]),
+            games_table.sort_values(["game_id", "team"]),
+            check_like=True,
+        )
+        for grouping_column, prefix in [("player_name", "player"), ("team", "team")]:
+            assert_frame_equal(
+                db._parse_game_dates(db.read_data_table(f"{prefix}_form_table")),
+                db.get_rolling_stats_table(games_table, grouping_column, db.FORM_WINDOW),
+            )
+            assert_frame_equal(
+                db._parse_game_dates(db.read_data_table(f"{prefix}_cumulative_table")),
+                db.get_cumulative_stats_table(games_table, grouping_column),
+            )
+            assert_frame_equal(
+                db.read_data_table(f"{prefix}_matchups_table", index_col=[0, 1]),
+                db.get_matchups_table(games_table, grouping_column),
+            )
+        matchups_table = db.read_data_table("team_matchups_table", index_col=[0, 1])
+        assert matchups_table.loc[("ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ", "ΑΡΗΣ"), "games_played"] == 2
+        assert matchups_table.loc[("ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ", "ΑΡΗΣ"), "wins"] == 1
+
+
+def _ingest_games(tmp_path, game_ids):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    with _patch_data_dir(tmp_path):
+        for game_id in game_ids:
+            game_data = dummy_games_data.iloc[[0]].assign(game_id=game_id)
+            db.ingest_game(game_data, game_id)
+            # Re-scrapes of games ingested by other processes are skipped
+            db.ingest_game(game_data, game_ids[0])
+
+
+def test_ingest_game_concurrently(tmp_path):
+    game_ids = [[f"{worker:02d}{game:06d}" for game in range(25)] for worker in range(8)]
+    with ProcessPoolExecutor(max_workers=8) as executor:
+        list(executor.map(_ingest_games, [tmp_path] * 8, game_ids))
+    with _patch_data_dir(tmp_path):
+        games_manifest = db.get_games_manifest()
+    assert len(os.listdir(tmp_path / "raw_games_data")) == 200
+    assert sorted(games_manifest.index) == sorted(sum(game_ids, []))
+
+
+def test_get_matchups_table():
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    opponent_data = dummy_games_data.copy()
+    opponent_data["team"] = "ΑΡΗΣ"
+    opponent_data["player_name"] = "ΜΠΕΤΣ ΑΝΤΡΙΟΥ"
+    opponent_data["points"] = [10.0, 20.0]
+    dummy_games_data = pd.concat([dummy_games_data, opponent_data], ignore_index=True)
+
+    returned_team_data = db.get_matchups_table(dummy_games_data, "team")
+    assert list(returned_team_data.index) == [
+        ("ΑΡΗΣ", "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ"),
+        ("ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ", "ΑΡΗΣ"),
+    ]
+    assert returned_team_data.loc[("ΑΡΗΣ", "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ"), "games_played"] == 2
+    assert returned_team_data.loc[("ΑΡΗΣ", "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ"), "win_pct"] == 1.0
+    assert returned_team_data.loc[("ΑΡΗΣ", "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ"), "avg_points"] == 15.0
+
+    returned_player_data = db.get_matchups_table(dummy_games_data, "player_name")
+    assert returned_player_data.loc[("ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ", "ΑΡΗΣ"), "avg_points"] == 7.5
+    assert returned_player_data.loc[("ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ", "ΑΡΗΣ"), "wins"] == 0
+
+    for grouping_column in ["team", "player_name"]:
+        expected_data = db.get_matchups_table(dummy_games_data, grouping_column)
+        first_game_mask = dummy_games_data["game_id"] == "0010542C"
+        matchups_table = db.get_matchups_table(dummy_games_data[first_game_mask], grouping_column)
+        returned_data = db.update_matchups_table(
+            matchups_table,
+            dummy_games_data[first_game_mask],
+            dummy_games_data[~first_game_mask],
+            grouping_column,
+        )
+        assert_frame_equal(returned_data, expected_data)
+
+    # A changed version of the first game, which ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ now wins, replaces
+    # the previous one instead of being counted twice
+    changed_game_data = dummy_games_data[dummy_games_data["game_id"] == "0010542C"].copy()
+    changed_game_data.loc[changed_game_data["team"] == "ΑΡΗΣ", "points"] = 0.0
+    changed_game_data.loc[changed_game_data["team"] != "ΑΡΗΣ", "points"] = 30.0
+    for grouping_column in ["team", "player_name"]:
+        expected_data = db.get_matchups_table(
+            db.replace_games(dummy_games_data, changed_game_data), grouping_column
+        )
+        matchups_table = db.get_matchups_table(dummy_games_data, grouping_column)
+        returned_data = db.update_matchups_table(
+            matchups_table, dummy_games_data, changed_game_data, grouping_column
+        )
+        assert_frame_equal(returned_data, expected_data)
+    assert returned_data.loc[("ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ", "ΑΡΗΣ"), "games_played"] == 2
+    assert returned_data.loc[("ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ", "ΑΡΗΣ"), "wins"] == 1
+
+
+def test_get_games_table_from_files(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    (tmp_path / "raw_games_data").mkdir()
+    dummy_games_data.iloc[[0]].to_csv(tmp_path / "raw_games_data" / "0010542C.csv")
+    dummy_games_data.iloc[[1]].to_csv(tmp_path / "raw_games_data" / "0010A245.csv")
+    # A stale version of the first game from before the ingest was keyed by game_id, with
+    # different stats and a player that is not in the current version
+    legacy_data = pd.concat(
+        [dummy_games_data.iloc[[0]], dummy_games_data.iloc[[0]].assign(player_name="ΜΠΕΤΣ ΑΝΤΡΙΟΥ")]
+    ).assign(points=99.0)
+    legacy_data.to_csv(tmp_path / "raw_games_data" / "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ_ΑΡΗΣ.csv")
+    # A game only found in legacy files is kept
+    legacy_only_data = dummy_games_data.iloc[[1]].assign(game_id="0010B000")
+    legacy_only_data.to_csv(tmp_path / "raw_games_data" / "ΑΡΗΣ_ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ.csv")
+    with mock.patch("esake_scraper.db.DATA_DIR", tmp_path):
+        returned_data = db.get_games_table()
+    expected_data = pd.concat([dummy_games_data, legacy_only_data])
+    assert_frame_equal(returned_data.sort_values("game_id"), expected_data)
+
+
+def test_get_games_table_with_digit_game_id(tmp_path):
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    game_data = dummy_games_data.iloc[[0]].assign(game_id="00105421")
+    (tmp_path / "raw_games_data").mkdir()
+    game_data.to_csv(tmp_path / "raw_games_data" / "00105421.csv")
+    # A stale legacy copy of the same game, which the file named after the game_id overrides
+    game_data.assign(points=99.0).to_csv(tmp_path / "raw_games_data" / "ΠΑΝΑΘΗΝΑΪΚΟΣ ΟΠΑΠ_ΑΡΗΣ.csv")
+    with mock.patch("esake_scraper.db.DATA_DIR", tmp_path):
+        returned_data = db.get_games_table()
+    assert_frame_equal(returned_data, game_data)
+
+
+def test_get_derived_metrics_table():
+    dummy_games_data = pd.read_csv(TESTS_DATA_DIR / "dummy_games_for_stats.csv", index_col=0)
+    other_player_data = dummy_games_data.copy()
+    other_player_data["player_name"] = "ΜΠΕΤΣ ΑΝΤΡΙΟΥ"
+    other_player_data["points"] = [10.0, 20.0]
+    other_player_data["turnovers"] = [1.0, 1.0]
+    dummy_games_data = pd.concat([dummy_games_data, other_player_data], ignore_index=True)
+
+    with mock.patch.multiple(db, MIN_GAMES=2, MIN_MINUTES=0, MIN_SHOT_ATTEMPTS=0):
+        returned_data = db.get_derived_metrics_table(dummy_games_data, "player_name")
+    returned_data = returned_data.set_index("player_name")
+    assert all(
+        ptypes.is_float_dtype(returned_data[col])
+        for col in returned_data.columns.drop("games_played")
+    )
+    player_data = returned_data.loc["ΑΛΒΕΡΤΗΣ ΦΡΑΓΚΙΣΚΟΣ"]
+    # 15 points from 9 two point, 6 three point and 4 free throw attempts
+    assert player_data["true_shooting_pct"] == pytest.approx(15 / (2 * (15 + 0.44 * 4)))
+    assert player_data["points_per_minute"] == pytest.approx(15 / (2607 / 60))
+    assert player_data["assist_turnover_ratio"] == pytest.approx(4 / 5)
+    assert list(returned_data["avg_points_pct_rank"]) == [0.5, 1.0]
+    assert list(returned_data["avg_assists_pct_rank"]) == [0.75, 0.75]
+    # Fewer turnovers rank higher
+    assert list(returned_data["avg_turnovers_pct_rank"]) == [0.5, 1.0]
+
+    # Below the minimum volumes, metrics and ranks are NaN
+    with mock.patch.multiple(db, MIN_GAMES=3):
+        returned_data = db.get_derived_metrics_table(dummy_games_data, "player_name")
+    assert returned_data["true_shooting_pct"].isna().all()
+    assert returned_data["avg_points_pct_rank"].isna().all()